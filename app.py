@@ -2,27 +2,42 @@ import os
 import sqlite3
 import psycopg2
 import psycopg2.extras
+import psycopg2.extensions
 import json
 import requests
 import math
+import re
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, make_response
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, make_response, g, has_app_context
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
+from functools import wraps, lru_cache
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from itsdangerous import URLSafeTimedSerializer
 import logging
+import threading
+import time
 import uuid
 import traceback
 import stripe
 import sys
-from haversine import haversine, Unit
 from dotenv import load_dotenv
 import random
 import string
 import sendgrid
 from sendgrid.helpers.mail import Mail
 from urllib.parse import urlparse
+from services.geo_index import bounding_box, cells_within
+from services.distance import distances_from, haversine_miles
+from services.zip_gazetteer import lookup_zip
+from services.city_coordinates import lookup_city, lookup_cities
+from services.candidate_cache import CompatiblePlayerCache, backend_from_env
+from services.availability import (SLOT_MINUTES as AVAILABILITY_SLOT_MINUTES,
+                                   bits_to_mask, first_slot, mask_to_bits,
+                                   schedule_to_mask)
 
 DB_PATH = 'database/app.db'
 
@@ -44,7 +59,8 @@ def calculate_distance_from_location1(loc1_text, loc2_text):
     lat2, lon2 = parse_location_field(loc2_text)
     if None in (lat1, lon1, lat2, lon2):
         return None
-    return round(haversine((lat1, lon1), (lat2, lon2), unit=Unit.MILES), 1)
+    distance = haversine_miles(lat1, lon1, lat2, lon2)
+    return round(distance, 1) if distance is not None else None
 
 
 def generate_unique_player_id(conn, cursor, use_sqlite):
@@ -72,7 +88,8 @@ def generate_unique_player_id(conn, cursor, use_sqlite):
 
 # Import Random Matchup Engine
 try:
-    from services.random_matchup_engine import start_random_matchup_engine
+    from services.random_matchup_engine import (run_random_matchup_scheduler,
+                                                start_random_matchup_engine)
     RANDOM_MATCHUP_AVAILABLE = True
 except ImportError as e:
     logging.warning(f"Random Matchup Engine not available: {e}")
@@ -184,200 +201,12 @@ def estimate_coordinates_from_location(location_text):
     Estimate coordinates from location text using basic city/state mappings.
     This is a simple fallback for when exact GPS coordinates aren't available.
     """
-    if not location_text:
-        return None, None
-
-    # Common city coordinates for basic estimation (lat, lon)
-    city_coordinates = {
-        # New York Area
-        'manhattan': (40.7831, -73.9712),
-        'brooklyn': (40.6782, -73.9442),
-        'queens': (40.7282, -73.7949),
-        'bronx': (40.8448, -73.8648),
-        'new york': (40.7589, -73.9851),
-        'nyc': (40.7589, -73.9851),
-
-        # Major US Cities
-        'los angeles': (34.0522, -118.2437),
-        'chicago': (41.8781, -87.6298),
-        'houston': (29.7604, -95.3698),
-        'phoenix': (33.4484, -112.0740),
-        'philadelphia': (39.9526, -75.1652),
-        'san antonio': (29.4241, -98.4936),
-        'san diego': (32.7157, -117.1611),
-        'dallas': (32.7767, -96.7970),
-        'san jose': (37.3382, -121.8863),
-        'austin': (30.2672, -97.7431),
-        'jacksonville': (30.3322, -81.6557),
-        'fort worth': (32.7555, -97.3308),
-        'columbus': (39.9612, -82.9988),
-        'san francisco': (37.7749, -122.4194),
-        'charlotte': (35.2271, -80.8431),
-        'indianapolis': (39.7684, -86.1581),
-        'seattle': (47.6062, -122.3321),
-        'denver': (39.7392, -104.9903),
-        'boston': (42.3601, -71.0589),
-        'el paso': (31.7619, -106.4850),
-        'detroit': (42.3314, -83.0458),
-        'nashville': (36.1627, -86.7816),
-        'portland': (45.5152, -122.6784),
-        'oklahoma city': (35.4676, -97.5164),
-        'las vegas': (36.1699, -115.1398),
-        'louisville': (38.2527, -85.7585),
-        'baltimore': (39.2904, -76.6122),
-        'milwaukee': (43.0389, -87.9065),
-        'albuquerque': (35.0844, -106.6504),
-        'tucson': (32.2226, -110.9747),
-        'fresno': (36.7378, -119.7871),
-        'sacramento': (38.5816, -121.4944),
-        'kansas city': (39.0997, -94.5786),
-        'mesa': (33.4152, -111.8315),
-        'atlanta': (33.7490, -84.3880),
-        'omaha': (41.2565, -95.9345),
-        'colorado springs': (38.8339, -104.8214),
-        'raleigh': (35.7796, -78.6382),
-        'miami': (25.7617, -80.1918),
-        'cleveland': (41.4993, -81.6944),
-        'tulsa': (36.1540, -95.9928),
-        'oakland': (37.8044, -122.2711),
-        'minneapolis': (44.9778, -93.2650),
-        'wichita': (37.6872, -97.3301),
-        'arlington': (32.7357, -97.1081),
-        'new orleans': (29.9511, -90.0715),
-        'bakersfield': (35.3733, -119.0187),
-        'tampa': (27.9506, -82.4572),
-        'honolulu': (21.3099, -157.8581),
-        'anaheim': (33.8366, -117.9143),
-        'aurora': (39.7294, -104.8319),
-        'santa ana': (33.7455, -117.8677),
-        'st. louis': (38.6270, -90.1994),
-        'riverside': (33.9533, -117.3962),
-        'corpus christi': (27.8006, -97.3964),
-        'lexington': (38.0406, -84.5037),
-        'pittsburgh': (40.4406, -79.9959),
-        'anchorage': (61.2181, -149.9003),
-        'stockton': (37.9577, -121.2908),
-        'cincinnati': (39.1031, -84.5120),
-        'st. paul': (44.9537, -93.0900),
-        'toledo': (41.6528, -83.5379),
-        'newark': (40.7357, -74.1724),
-        'greensboro': (36.0726, -79.7920),
-        'plano': (33.0198, -96.6989),
-        'henderson': (36.0395, -114.9817),
-        'lincoln': (40.8136, -96.7026),
-        'buffalo': (42.8864, -78.8784),
-        'jersey city': (40.7178, -74.0431),
-        'chula vista': (32.6401, -117.0842),
-        'fort wayne': (41.0793, -85.1394),
-        'orlando': (28.5383, -81.3792),
-        'st. petersburg': (27.7676, -82.6403),
-        'chandler': (33.3062, -111.8413),
-        'laredo': (27.5306, -99.4803),
-        'norfolk': (36.8468, -76.2852),
-        'durham': (35.9940, -78.8986),
-        'madison': (43.0731, -89.4012),
-        'lubbock': (33.5779, -101.8552),
-        'irvine': (33.6846, -117.8265),
-        'winston-salem': (36.0999, -80.2442),
-        'glendale': (33.5387, -112.1860),
-        'garland': (32.9126, -96.6389),
-        'hialeah': (25.8576, -80.2781),
-        'reno': (39.5296, -119.8138),
-        'chesapeake': (36.7682, -76.2875),
-        'gilbert': (33.3528, -111.7890),
-        'baton rouge': (30.4515, -91.1871),
-        'irving': (32.8140, -96.9489),
-        'scottsdale': (33.4942, -111.9261),
-        'north las vegas': (36.1989, -115.1175),
-        'fremont': (37.5485, -121.9886),
-        'boise': (43.6150, -116.2023),
-        'richmond': (37.5407, -77.4360),
-        'san bernardino': (34.1083, -117.2898),
-        'birmingham': (33.5186, -86.8104),
-        'spokane': (47.6587, -117.4260),
-        'rochester': (43.1566, -77.6088),
-        'des moines': (41.5868, -93.6250),
-        'modesto': (37.6391, -120.9969),
-        'fayetteville': (36.0726, -94.1574),
-        'tacoma': (47.2529, -122.4443),
-        'oxnard': (34.1975, -119.1771),
-        'fontana': (34.0922, -117.4350),
-        'columbus': (32.4609, -84.9877),
-        'montgomery': (32.3617, -86.2792),
-        'moreno valley': (33.9425, -117.2297),
-        'shreveport': (32.5252, -93.7502),
-        'aurora': (41.7606, -88.3201),
-        'yonkers': (40.9312, -73.8988),
-        'akron': (41.0814, -81.5190),
-        'huntington beach': (33.6595, -117.9988),
-        'little rock': (34.7465, -92.2896),
-        'augusta': (33.4735, -82.0105),
-        'amarillo': (35.2220, -101.8313),
-        'glendale': (34.1425, -118.2551),
-        'mobile': (30.6954, -88.0399),
-        'grand rapids': (42.9634, -85.6681),
-        'salt lake city': (40.7608, -111.8910),
-        'tallahassee': (30.4518, -84.2807),
-        'huntsville': (34.7304, -86.5861),
-        'grand prairie': (32.7460, -96.9978),
-        'knoxville': (35.9606, -83.9207),
-        'worcester': (42.2626, -71.8023),
-        'newport news': (37.0871, -76.4730),
-        'brownsville': (25.9018, -97.4975),
-        'overland park': (38.9822, -94.6708),
-        'santa clarita': (34.3917, -118.5426),
-        'providence': (41.8240, -71.4128),
-        'garden grove': (33.7739, -117.9414),
-        'chattanooga': (35.0456, -85.3097),
-        'oceanside': (33.1959, -117.3795),
-        'jackson': (32.2988, -90.1848),
-        'fort lauderdale': (26.1224, -80.1373),
-        'santa rosa': (38.4404, -122.7144),
-        'rancho cucamonga': (34.1064, -117.5931),
-        'port st. lucie': (27.2939, -80.3501),
-        'tempe': (33.4255, -111.9400),
-        'ontario': (34.0633, -117.6509),
-        'vancouver': (45.6387, -122.6615),
-        'cape coral': (26.5629, -81.9495),
-        'sioux falls': (43.5446, -96.7311),
-        'springfield': (39.7817, -89.6501),
-        'peoria': (40.6936, -89.5890),
-        'pembroke pines': (26.0073, -80.2962),
-        'elk grove': (38.4088, -121.3716),
-        'corona': (33.8753, -117.5664),
-        'lancaster': (34.6868, -118.1542),
-        'eugene': (44.0521, -123.0868),
-        'palmdale': (34.5794, -118.1165),
-        'salinas': (36.6777, -121.6555),
-        'springfield': (37.2153, -93.2982),
-        'pasadena': (34.1478, -118.1445),
-        'fort collins': (40.5853, -105.0844),
-        'hayward': (37.6688, -122.0808),
-        'pomona': (34.0555, -117.7500),
-        'cary': (35.7915, -78.7811),
-        'rockford': (42.2711, -89.0940),
-        'alexandria': (38.8048, -77.0469),
-        'escondido': (33.1192, -117.0864),
-        'mckinney': (33.1972, -96.6397),
-        'kansas city': (39.1142, -94.6275),
-        'joliet': (41.5250, -88.0817),
-        'sunnyvale': (37.3688, -122.0363)
-    }
+    return lookup_city(location_text)
 
-    location_lower = location_text.lower().strip()
 
-    # Try direct city lookup
-    if location_lower in city_coordinates:
-        return city_coordinates[location_lower]
-
-    # Try to extract city from "City, State" format
-    if ',' in location_lower:
-        city_part = location_lower.split(',')[0].strip()
-        if city_part in city_coordinates:
-            return city_coordinates[city_part]
-
-    # If no match found, return None
-    return None, None
+def estimate_coordinates_for_locations(location_texts):
+    """Batch form of estimate_coordinates_from_location(); returns one (lat, lon) per input"""
+    return lookup_cities(location_texts)
 
 
 def calculate_distance_between_players(player1_data, player2_data):
@@ -394,10 +223,8 @@ def calculate_distance_between_players(player1_data, player2_data):
 
         # If both players have exact coordinates, use those
         if lat1 is not None and lon1 is not None and lat2 is not None and lon2 is not None:
-            lat1, lon1, lat2, lon2 = float(lat1), float(lon1), float(
-                lat2), float(lon2)
-            distance = haversine((lat1, lon1), (lat2, lon2), unit=Unit.MILES)
-            return round(distance, 1)
+            distance = haversine_miles(lat1, lon1, lat2, lon2)
+            return round(distance, 1) if distance is not None else None
 
         # Fall back to estimated coordinates from location text
         if lat1 is None or lon1 is None:
@@ -410,10 +237,8 @@ def calculate_distance_between_players(player1_data, player2_data):
 
         # If we have coordinates for both players, calculate distance
         if lat1 is not None and lon1 is not None and lat2 is not None and lon2 is not None:
-            lat1, lon1, lat2, lon2 = float(lat1), float(lon1), float(
-                lat2), float(lon2)
-            distance = haversine((lat1, lon1), (lat2, lon2), unit=Unit.MILES)
-            return round(distance, 1)
+            distance = haversine_miles(lat1, lon1, lat2, lon2)
+            return round(distance, 1) if distance is not None else None
 
         # If we can't calculate distance, return None
         return None
@@ -423,36 +248,59 @@ def calculate_distance_between_players(player1_data, player2_data):
         return None
 
 
+def format_distance_display(distance):
+    """Format a distance in miles for player cards, or None if unknown"""
+    if distance is None:
+        return None
+    if distance < 1:
+        return "< 1 mile away"
+    elif distance < 10:
+        return f"~{round(distance, 1)} miles away"
+    else:
+        return f"~{int(distance)} miles away"
+
+
+def get_player_origin(player_id):
+    """
+    Return {'latitude', 'longitude', 'location1'} for a player, fetched at most
+    once per request (cached on flask.g) so per-card distance lookups don't
+    each re-query the current player.
+    """
+    origins = g.setdefault('_player_origins', {}) if has_app_context() else {}
+    if player_id not in origins:
+        conn = get_request_db_connection()
+        row = conn.execute(
+            'SELECT latitude, longitude, location1 FROM players WHERE id = ?',
+            (player_id, )).fetchone()
+        conn.close()
+        origins[player_id] = dict(row) if row else None
+    return origins[player_id]
+
+
 def get_distance_from_current_player(player_data, current_player_id):
     """
     Calculate distance from current logged-in player to another player.
     Returns formatted distance string or None.
+
+    Uses the candidate's precomputed distance_display/distance_miles when the
+    matchmaking pipeline already filled them in.
     """
     if not current_player_id or not player_data:
         return None
 
     try:
-        conn = get_db_connection()
-        current_player = conn.execute(
-            'SELECT latitude, longitude, location1 FROM players WHERE id = ?',
-            (current_player_id, )).fetchone()
-        conn.close()
+        player_data = dict(player_data)
+        if player_data.get('distance_display'):
+            return player_data['distance_display']
+        if player_data.get('distance_miles') is not None:
+            return format_distance_display(player_data['distance_miles'])
 
+        current_player = get_player_origin(current_player_id)
         if not current_player:
             return None
 
-        distance = calculate_distance_between_players(dict(current_player),
-                                                      dict(player_data))
-
-        if distance is not None:
-            if distance < 1:
-                return "< 1 mile away"
-            elif distance < 10:
-                return f"~{distance} miles away"
-            else:
-                return f"~{int(distance)} miles away"
-
-        return None
+        return format_distance_display(
+            calculate_distance_between_players(current_player, player_data))
 
     except Exception as e:
         logging.error(f"Error getting distance from current player: {e}")
@@ -684,7 +532,11 @@ app.jinja_env.filters['from_json'] = from_json_filter
 
 # Add distance calculation filter
 def distance_from_current_player_filter(player_data):
-    """Custom Jinja filter to calculate distance from current player"""
+    """
+    Custom Jinja filter to calculate distance from current player.
+    Reads the precomputed distance when present; otherwise the current
+    player's coordinates come from the per-request origin cache.
+    """
     current_player_id = session.get('current_player_id')
     if not current_player_id:
         return None
@@ -716,6 +568,17 @@ else:
     logging.info("Random Matchup Engine disabled or not available")
 
 
+@app.cli.command('run-jobs')
+def run_jobs_command():
+    """Run the background jobs in this process (flask --app main run-jobs); web workers leave them off"""
+    if RANDOM_MATCHUP_AVAILABLE:
+        threading.Thread(target=run_random_matchup_scheduler,
+                         name='random-matchups', daemon=True).start()
+    else:
+        logging.warning("Random Matchup Engine not available; running trial expiry only")
+    run_trial_expiry_job()
+
+
 def allowed_file(filename):
     """Check if uploaded file has allowed extension"""
     return '.' in filename and \
@@ -731,19 +594,13 @@ def require_disclaimers_accepted(f):
         player_id = kwargs.get('player_id') or request.form.get('player_id')
 
         if player_id:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT disclaimers_accepted, test_account FROM players WHERE id = ?',
-                (player_id, ))
-            player = cursor.fetchone()
-            conn.close()
+            player = load_principal(player_id)
 
             # Skip validation for test accounts
-            if player and player['test_account']:
+            if player and player.test_account:
                 return f(*args, **kwargs)
 
-            if player and not player['disclaimers_accepted']:
+            if player and not player.disclaimers_accepted:
                 flash(
                     'Please accept our terms and disclaimers to continue using Ready 2 Dink',
                     'warning')
@@ -801,6 +658,78 @@ def _convert_placeholders(query: str) -> str:
     # replaces every '?' with '%s'
     return query.replace('?', '%s')
 
+# Per-request query instrumentation (see CursorProxy.execute)
+DB_QUERY_LOG_THRESHOLD = int(os.environ.get('DB_QUERY_LOG_THRESHOLD', 25))
+DB_TIME_LOG_THRESHOLD_MS = float(os.environ.get('DB_TIME_LOG_THRESHOLD_MS', 500))
+DB_REPEAT_LOG_THRESHOLD = int(os.environ.get('DB_REPEAT_LOG_THRESHOLD', 5))
+DB_SERVER_TIMING = os.environ.get('DB_SERVER_TIMING', '0') == '1'
+
+_SQL_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _statement_shape(query):
+    """Collapse whitespace and literals so repeated statements group together."""
+    shape = _SQL_LITERAL_RE.sub('?', query)
+    return _SQL_WHITESPACE_RE.sub(' ', shape).strip()
+
+
+class QueryStats:
+    """Statement count, DB time and repeated statement shapes for one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+
+    def record(self, query, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.shapes[_statement_shape(query)] += 1
+
+    def repeated(self, min_count=2):
+        """Return [(shape, count)] for statements issued at least min_count times."""
+        return [(shape, n) for shape, n in self.shapes.most_common()
+                if n >= min_count]
+
+    def exceeds_thresholds(self):
+        return (self.count >= DB_QUERY_LOG_THRESHOLD
+                or self.total_ms >= DB_TIME_LOG_THRESHOLD_MS
+                or bool(self.repeated(DB_REPEAT_LOG_THRESHOLD)))
+
+
+def _current_query_stats():
+    if not has_app_context():
+        return None
+    stats = g.get('_db_query_stats')
+    if stats is None:
+        stats = QueryStats()
+        g._db_query_stats = stats
+    return stats
+
+
+@contextmanager
+def capture_queries():
+    """
+    Record the statements issued inside the block, e.g. to pin query counts in tests:
+
+        with app.test_request_context(), capture_queries() as stats:
+            browse_players()
+        assert not stats.repeated(3)
+    """
+    previous = g.get('_db_query_stats')
+    stats = QueryStats()
+    g._db_query_stats = stats
+    try:
+        yield stats
+    finally:
+        if previous is not None:
+            previous.count += stats.count
+            previous.total_ms += stats.total_ms
+            previous.shapes.update(stats.shapes)
+        g._db_query_stats = previous
+
+
 class CursorProxy:
     """Thin wrapper around psycopg2 cursor to emulate sqlite3 cursor API used in the app."""
     def __init__(self, cursor):
@@ -808,14 +737,26 @@ class CursorProxy:
 
     def execute(self, query, params=None):
         q = _convert_placeholders(query)
-        if params is None:
-            return self._cur.execute(q)
-        # psycopg2 expects tuples/lists
-        return self._cur.execute(q, tuple(params))
+        stats = _current_query_stats()
+        started = time.perf_counter()
+        try:
+            if params is None:
+                return self._cur.execute(q)
+            # psycopg2 expects tuples/lists
+            return self._cur.execute(q, tuple(params))
+        finally:
+            if stats is not None:
+                stats.record(q, (time.perf_counter() - started) * 1000)
 
     def executemany(self, query, seq_of_params):
         q = _convert_placeholders(query)
-        return self._cur.executemany(q, seq_of_params)
+        stats = _current_query_stats()
+        started = time.perf_counter()
+        try:
+            return self._cur.executemany(q, seq_of_params)
+        finally:
+            if stats is not None:
+                stats.record(q, (time.perf_counter() - started) * 1000)
 
     def fetchone(self):
         row = self._cur.fetchone()
@@ -843,9 +784,13 @@ class ConnectionProxy:
      - commit()
      - close()
      - execute(...).fetchone() usage is handled because execute returns a CursorProxy
+
+    The underlying psycopg2 connection is borrowed from the process-wide pool;
+    close() hands it back instead of tearing down the socket.
     """
-    def __init__(self, conn):
+    def __init__(self, conn, pool=None):
         self._conn = conn
+        self._pool = pool
         # Dict cursor factory will be used by cursor() below
 
     def cursor(self):
@@ -867,8 +812,22 @@ class ConnectionProxy:
         return self._conn.rollback()
 
     def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self._pool is not None:
+            self._pool.release(conn)
+            return
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def __del__(self):
+        # Many routes forget to close on early returns; make sure the pooled
+        # connection goes back instead of leaking a slot forever.
         try:
-            self._conn.close()
+            self.close()
         except Exception:
             pass
 
@@ -886,10 +845,7 @@ class ConnectionProxy:
                 self._conn.commit()
             except Exception:
                 pass
-        try:
-            self._conn.close()
-        except Exception:
-            pass
+        self.close()
 
 def _get_conn_params_from_env():
     """Return connection params. Prefer DATABASE_URL if present."""
@@ -916,54 +872,393 @@ def _get_conn_params_from_env():
         'sslmode': os.environ.get('PG_SSLMODE', 'prefer')
     }
 
-def get_db_connection():
-    """
-    Open a psycopg2 connection and return a ConnectionProxy which emulates the sqlite API your app uses.
-    Use this instead of sqlite3.connect(...) in your code.
-    """
+
+def _open_raw_connection():
+    """Open a brand new psycopg2 connection from DATABASE_URL/PG_* env vars."""
     params = _get_conn_params_from_env()
 
     # If DATABASE_URL was given, pass it directly (psycopg2 accepts the URL), otherwise pass dict
+    if os.environ.get('DATABASE_URL') or os.environ.get('PG_DATABASE_URL'):
+        raw = os.environ.get('DATABASE_URL') or os.environ.get('PG_DATABASE_URL')
+        conn = psycopg2.connect(raw)
+    else:
+        conn = psycopg2.connect(
+            host=params['host'],
+            port=params['port'],
+            database=params['database'],
+            user=params['user'],
+            password=params['password'],
+            sslmode=params.get('sslmode', 'prefer')
+        )
+    # Set autocommit = False and let commit() be explicit in your code
+    conn.autocommit = False
+    return conn
+
+
+class DatabasePool:
+    """
+    Process-wide, thread-safe pool of psycopg2 connections.
+
+    - Keeps between PG_POOL_MIN and PG_POOL_MAX connections per process
+    - Blocks up to PG_POOL_TIMEOUT seconds when every connection is checked out
+    - Health-checks a connection on checkout (SELECT 1 once it has sat idle
+      longer than PG_POOL_PING_AFTER seconds) and replaces dead ones
+    - Rolls back any open transaction when a connection is returned
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=30, ping_after=30):
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._idle = []  # list of (conn, returned_at)
+        for _ in range(self.minconn):
+            try:
+                self._idle.append((_open_raw_connection(), time.monotonic()))
+            except Exception as e:
+                logging.warning(f"Could not pre-open pooled connection: {e}")
+                break
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        status = conn.get_transaction_status()
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if idle_for < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RuntimeError(
+                f"Timed out after {self.timeout}s waiting for a database connection "
+                f"(PG_POOL_MAX={self.maxconn})")
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    return _open_raw_connection()
+                conn, returned_at = entry
+                if self._is_healthy(conn, time.monotonic() - returned_at):
+                    return conn
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.closed:
+                return
+            status = conn.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                self._discard(conn)
+                return
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+            with self._lock:
+                if len(self._idle) < self.maxconn:
+                    self._idle.append((conn, time.monotonic()))
+                    conn = None
+            if conn is not None:
+                self._discard(conn)
+        except Exception as e:
+            logging.warning(f"Dropping pooled connection that failed reset: {e}")
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    """Return the connection pool for this process, creating it on first use."""
+    global _db_pool
+    pool = _db_pool
+    # gunicorn forks workers; never share sockets inherited from the parent
+    if pool is None or pool.pid != os.getpid():
+        with _db_pool_lock:
+            if _db_pool is None or _db_pool.pid != os.getpid():
+                _db_pool = DatabasePool(
+                    minconn=int(os.environ.get('PG_POOL_MIN', 1)),
+                    maxconn=int(os.environ.get('PG_POOL_MAX', 10)),
+                    timeout=float(os.environ.get('PG_POOL_TIMEOUT', 30)),
+                    ping_after=float(os.environ.get('PG_POOL_PING_AFTER',
+                                                    30)))
+            pool = _db_pool
+    return pool
+
+
+def get_db_connection():
+    """
+    Borrow a psycopg2 connection from the pool and return a ConnectionProxy which emulates the sqlite API your app uses.
+    Use this instead of sqlite3.connect(...) in your code. conn.close() returns it to the pool.
+    """
     try:
-        if os.environ.get('DATABASE_URL') or os.environ.get('PG_DATABASE_URL'):
-            raw = os.environ.get('DATABASE_URL') or os.environ.get('PG_DATABASE_URL')
-            conn = psycopg2.connect(raw)
-        else:
-            conn = psycopg2.connect(
-                host=params['host'],
-                port=params['port'],
-                database=params['database'],
-                user=params['user'],
-                password=params['password'],
-                sslmode=params.get('sslmode', 'prefer')
-            )
-        # Set autocommit = False and let commit() be explicit in your code
-        conn.autocommit = False
+        pool = get_db_pool()
+        conn = pool.acquire()
     except Exception as e:
         # If connection fails, raise a helpful error
         raise RuntimeError("Unable to connect to PostgreSQL. Check DATABASE_URL/PG_* env vars. Error: " + str(e))
 
-    return ConnectionProxy(conn)
+    return ConnectionProxy(conn, pool)
+
+
+class RequestConnectionProxy(ConnectionProxy):
+    """
+    Read-only ConnectionProxy shared by lookup helpers within one app context.
+
+    The connection runs in autocommit mode, so there is never uncommitted
+    work on it for one helper to commit or roll back on another's behalf,
+    and a failed statement does not poison the statements after it. Helpers
+    that write (award_points, GeocodeCache.put, ...) borrow their own pooled
+    connection with get_db_connection() instead. conn.close() is a no-op;
+    the connection goes back to the pool in the teardown handler.
+    """
+
+    def close(self):
+        pass
+
+    def release(self):
+        ConnectionProxy.close(self)
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+
+
+def get_request_db_connection():
+    """
+    Return the read-only connection bound to the current Flask app context, opening it on first use.
+
+    Outside an app context (background threads, scripts) this falls back to a
+    normal pooled connection, so callers can always close() what they get.
+    """
+    if not has_app_context():
+        return get_db_connection()
+
+    conn = g.get('_request_db_conn')
+    if conn is None or conn._conn is None:
+        pool = get_db_pool()
+        try:
+            raw = pool.acquire()
+        except Exception as e:
+            raise RuntimeError("Unable to connect to PostgreSQL. Check DATABASE_URL/PG_* env vars. Error: " + str(e))
+        raw.autocommit = True  # reset by DatabasePool.release()
+        conn = RequestConnectionProxy(raw, pool)
+        g._request_db_conn = conn
+    return conn
+
+
+@app.teardown_appcontext
+def release_request_db_connection(exc):
+    """Return the app-context connection to the pool at the end of the request."""
+    conn = g.pop('_request_db_conn', None)
+    if conn is not None:
+        conn.release()
+
+
+@app.after_request
+def report_request_query_stats(response):
+    """Log DB-heavy requests (likely N+1s) and optionally expose a Server-Timing header."""
+    stats = g.get('_db_query_stats')
+    if stats is None:
+        return response
+
+    if DB_SERVER_TIMING:
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries"')
+
+    if stats.exceeds_thresholds():
+        logging.warning(
+            json.dumps({
+                'event': 'db_query_stats',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'queries': stats.count,
+                'db_ms': round(stats.total_ms, 1),
+                'repeated': [{
+                    'sql': shape[:200],
+                    'count': n
+                } for shape, n in stats.repeated(2)[:5]],
+            }))
+    return response
+
+
+SETTINGS_CACHE_TTL = float(os.environ.get('SETTINGS_CACHE_TTL', 60))
+SETTINGS_NOTIFY_CHANNEL = 'settings_changed'
+
+
+_MISSING = object()
+
+
+class SettingsCache:
+    """
+    In-process copy of the whole settings table.
+
+    Loaded with one query and refreshed after SETTINGS_CACHE_TTL seconds or
+    as soon as it is invalidated. Writers call invalidate() locally and send a
+    NOTIFY on SETTINGS_NOTIFY_CHANNEL so other gunicorn workers drop their
+    copy too; a daemon thread per process LISTENs for that. If the listener
+    can't connect, the TTL still bounds how stale a worker can get.
+
+    `version` increases whenever the loaded values change, so derived data
+    can be rebuilt once per version instead of once per request.
+    """
+
+    def __init__(self, ttl=SETTINGS_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._values = {}
+        self._loaded_at = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._listener_pid = None
+
+    def _is_fresh(self):
+        return (self._loaded_at is not None
+                and time.monotonic() - self._loaded_at < self.ttl)
+
+    def _load(self):
+        generation = self._generation
+        conn = get_request_db_connection()
+        rows = conn.execute('SELECT key, value FROM settings').fetchall()
+        conn.close()
+        values = {row['key']: row['value'] for row in rows}
+        with self._lock:
+            # An invalidate() while we were reading may have made these rows
+            # stale; drop them and let the next call reload
+            if generation != self._generation:
+                return
+            if values != self._values:
+                self._values = values
+                self.version += 1
+            self._loaded_at = time.monotonic()
+
+    def refresh_if_stale(self):
+        self._ensure_listener()
+        if not self._is_fresh():
+            self._load()
+
+    def get(self, key, default=None):
+        self.refresh_if_stale()
+        value = self._values.get(key, _MISSING)
+        return default if value is _MISSING else value
+
+    def all(self):
+        self.refresh_if_stale()
+        return dict(self._values)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = None
+
+    def _ensure_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        if os.environ.get('SETTINGS_LISTEN', '1') != '1':
+            return
+        threading.Thread(target=self._listen_loop,
+                         name='settings-listener',
+                         daemon=True).start()
+
+    def _listen_loop(self):
+        import select
+
+        while True:
+            conn = None
+            try:
+                conn = _open_raw_connection()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN {SETTINGS_NOTIFY_CHANNEL}')
+                # Anything could have changed while we were disconnected
+                self.invalidate()
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self.invalidate()
+            except Exception as e:
+                logging.warning(f"Settings listener disconnected: {e}")
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(30)
+
+
+settings_cache = SettingsCache()
+
 
 def get_setting(key, default=None):
-    """Get a setting value from database"""
+    """Get a setting value (served from the in-process settings cache)"""
+    return settings_cache.get(key, default)
+
+
+def save_settings(values):
+    """Write several settings in one transaction and invalidate every worker's cache"""
     conn = get_db_connection()
-    setting = conn.execute('SELECT value FROM settings WHERE key = ?',
-                           (key, )).fetchone()
-    conn.close()
-    return setting['value'] if setting else default
+    try:
+        for key, value in values.items():
+            conn.execute(
+                '''
+                INSERT INTO settings (key, value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (key) DO UPDATE
+                SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at
+            ''', (key, value))
+        conn.execute('SELECT pg_notify(?, ?)',
+                     (SETTINGS_NOTIFY_CHANNEL, ','.join(values)))
+        conn.commit()
+    finally:
+        conn.close()
+    settings_cache.invalidate()
 
 
 def update_setting(key, value):
     """Update a setting in database"""
-    conn = get_db_connection()
-    conn.execute(
-        '''
-        INSERT OR REPLACE INTO settings (key, value, updated_at)
-        VALUES (?, ?, CURRENT_TIMESTAMP)
-    ''', (key, value))
-    conn.commit()
-    conn.close()
+    save_settings({key: value})
 
 
 def award_points(player_id, points, reason, conn=None):
@@ -1356,98 +1651,237 @@ def set_user_permissions(player_id, membership_type):
 
     conn.commit()
     conn.close()
+    forget_principal(player_id)
+
+
+PERMISSION_COLUMNS = ('can_search_players', 'can_send_challenges',
+                      'can_receive_challenges', 'can_join_tournaments',
+                      'can_view_leaderboard', 'can_view_premium_stats')
+
+# Permission flags a player keeps after a trial lapses (Free Search)
+FREE_SEARCH_PERMISSIONS = {
+    'can_search_players': 1,
+    'can_send_challenges': 1,
+    'can_receive_challenges': 1,
+    'can_join_tournaments': 0,
+    'can_view_leaderboard': 0,
+    'can_view_premium_stats': 0
+}
+
+
+class Principal:
+    """Everything the auth decorators and context processor need about one player, loaded in one query"""
+
+    __slots__ = ('id', 'is_admin', 'permissions', 'membership_type',
+                 'subscription_status', 'trial_end_date',
+                 'disclaimers_accepted', 'nda_accepted', 'test_account',
+                 'trial_downgraded')
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.is_admin = bool(row['is_admin'])
+        self.permissions = {col: row[col] for col in PERMISSION_COLUMNS}
+        self.membership_type = row['membership_type']
+        self.subscription_status = row['subscription_status']
+        self.trial_end_date = row['trial_end_date']
+        self.disclaimers_accepted = bool(row['disclaimers_accepted'])
+        self.nda_accepted = bool(row['nda_accepted'])
+        self.test_account = bool(row['test_account'])
+        self.trial_downgraded = False
+
+    def has_permission(self, permission):
+        return bool(self.permissions.get(permission))
+
+    def trial_has_expired(self):
+        """Whether the loaded trial_end_date has passed for a player still on a trial"""
+        return trial_has_expired(self.subscription_status,
+                                 self.trial_end_date, self.id)
+
+    def apply_trial_downgrade(self):
+        self.membership_type = 'free_search'
+        self.subscription_status = 'expired'
+        self.permissions.update(FREE_SEARCH_PERMISSIONS)
+        self.trial_downgraded = True
+
+
+def trial_has_expired(subscription_status, trial_end_date, player_id=None):
+    """Whether a trial that is still marked trialing has passed its trial_end_date"""
+    if not trial_end_date or subscription_status != 'trialing':
+        return False
+    try:
+        return datetime.now() > datetime.fromisoformat(trial_end_date)
+    except (TypeError, ValueError) as e:
+        logging.error(f"Error checking trial expiry for player {player_id}: {e}")
+        return False
 
 
-def check_user_permission(player_id, permission):
-    """Check if a user has a specific permission"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(f'SELECT {permission} FROM players WHERE id = ?',
-                   (player_id, ))
-    result = cursor.fetchone()
+def with_trial_downgrade(player):
+    """
+    A players row as its membership currently stands.
+
+    Rows whose trial has lapsed get a copy with the Free Search values applied
+    (not persisted; expire_trials() writes them back); other rows are returned
+    unchanged. Views that show membership or subscription status go through
+    this so they agree with the permission checks in load_principal().
+    """
+    if not trial_has_expired(player['subscription_status'],
+                             player['trial_end_date'], player['id']):
+        return player
+    player = dict(player)
+    player.update(FREE_SEARCH_PERMISSIONS,
+                  membership_type='free_search',
+                  subscription_status='expired')
+    return player
+
+
+def load_principal(player_id):
+    """
+    Return the Principal for player_id, or None if there is no such player.
+
+    Cached on flask.g for the rest of the request. An expired trial is
+    treated as Free Search in memory; expire_trials() writes it back.
+    """
+    try:
+        player_id = int(player_id)
+    except (TypeError, ValueError):
+        return None
+
+    cache = g.setdefault('_principals', {}) if has_app_context() else {}
+    if player_id in cache:
+        return cache[player_id]
+
+    conn = get_request_db_connection()
+    row = conn.execute(
+        f'''
+        SELECT id, is_admin, {', '.join(PERMISSION_COLUMNS)},
+               membership_type, subscription_status, trial_end_date,
+               disclaimers_accepted, nda_accepted, test_account
+        FROM players WHERE id = ?
+    ''', (player_id, )).fetchone()
     conn.close()
+    principal = Principal(row) if row else None
 
-    if result and result[permission]:
-        return True
-    return False
+    # The scheduled expire_trials() job persists the downgrade; requests
+    # only need to stop honouring premium flags the moment the trial ends.
+    if principal and principal.trial_has_expired():
+        principal.apply_trial_downgrade()
+
+    cache[player_id] = principal
+    return principal
+
+
+def forget_principal(*player_ids):
+    """Drop cached Principals after writing to those players' auth columns"""
+    if not has_app_context():
+        return
+    cache = g.get('_principals', {})
+    for player_id in player_ids:
+        try:
+            cache.pop(int(player_id), None)
+        except (TypeError, ValueError):
+            pass
+
+
+def get_current_principal():
+    """Principal for the logged-in player (session current_player_id), or None"""
+    current_player_id = session.get('current_player_id')
+    if not current_player_id:
+        return None
+    return load_principal(current_player_id)
+
+
+def check_user_permission(player_id, permission):
+    """Check if a user has a specific permission"""
+    principal = load_principal(player_id)
+    return bool(principal and principal.has_permission(permission))
 
 
 def check_and_handle_trial_expiry(player_id):
-    """Check if a user's trial has expired and downgrade if necessary"""
-    from datetime import datetime
+    """Check if a user's trial has expired (in memory; the batch job persists the downgrade)"""
+    principal = load_principal(player_id)
+    return bool(principal and principal.trial_downgraded)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        '''
-        SELECT id, trial_end_date, subscription_status, membership_type 
-        FROM players WHERE id = ?
-    ''', (player_id, ))
-    player = cursor.fetchone()
 
-    if not player:
-        conn.close()
-        return False
+TRIAL_EXPIRY_INTERVAL_SECONDS = int(
+    os.environ.get('TRIAL_EXPIRY_INTERVAL_SECONDS', 3600))
+TRIAL_EXPIRY_LOCK_KEY = 7202001  # pg advisory lock id for the expiry job
 
-    # Skip if user doesn't have a trial end date or is already on a paid plan
-    if not player['trial_end_date'] or player[
-            'subscription_status'] == 'active':
-        conn.close()
-        return False
 
-    # Check if trial has expired
+def expire_trials():
+    """
+    Downgrade every lapsed trial to Free Search in one statement.
+
+    Returns the ids of the downgraded players. Workers race for an advisory
+    lock so only one of them runs the UPDATE per tick.
+    """
+    conn = get_db_connection()
     try:
-        trial_end = datetime.fromisoformat(player['trial_end_date'])
-        if datetime.now(
-        ) > trial_end and player['subscription_status'] == 'trialing':
-            # Trial has expired, downgrade to Free Search
-            cursor.execute(
-                '''
-                UPDATE players SET 
-                    membership_type = 'free_search',
-                    subscription_status = 'expired',
-                    can_search_players = 1,
-                    can_send_challenges = 1, 
-                    can_receive_challenges = 1,
-                    can_join_tournaments = 0,
-                    can_view_leaderboard = 0,
-                    can_view_premium_stats = 0
-                WHERE id = ?
-            ''', (player_id, ))
-            conn.commit()
-            conn.close()
-            logging.info(
-                f"Trial expired for player {player_id}, downgraded to Free Search"
-            )
-            return True
-    except Exception as e:
-        logging.error(
-            f"Error checking trial expiry for player {player_id}: {e}")
+        locked = conn.execute('SELECT pg_try_advisory_xact_lock(?) AS locked',
+                              (TRIAL_EXPIRY_LOCK_KEY, )).fetchone()
+        if not locked['locked']:
+            conn.rollback()
+            return []
 
-    conn.close()
-    return False
+        # trial_end_date is ISO text written with the app clock, so compare it
+        # with the app's datetime.now(); safe_timestamp() (schema.sql) turns
+        # anything unparsable into NULL instead of failing the whole UPDATE
+        expired = conn.execute(f'''
+            UPDATE players SET 
+                membership_type = 'free_search',
+                subscription_status = 'expired',
+                {', '.join(f'{col} = {val}' for col, val in FREE_SEARCH_PERMISSIONS.items())}
+            WHERE subscription_status = 'trialing'
+            AND safe_timestamp(trial_end_date) < ?
+            RETURNING id
+        ''', (datetime.now(), )).fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+
+    expired_ids = [row['id'] for row in expired]
+    forget_principal(*expired_ids)
+    if expired_ids:
+        logging.info(
+            f"Trial expired for players {expired_ids}, downgraded to Free Search")
+    return expired_ids
 
 
 def check_bulk_trial_expiry():
     """Check all users for trial expiry - can be run as a batch job"""
-    from datetime import datetime
+    count = len(expire_trials())
+    logging.info(f"Processed {count} expired trials in bulk check")
+    return count
 
-    conn = get_db_connection()
-    expired_trials = conn.execute('''
-        SELECT id FROM players 
-        WHERE trial_end_date IS NOT NULL 
-        AND subscription_status = 'trialing'
-        AND datetime(trial_end_date) < datetime('now')
-    ''').fetchall()
 
-    count = 0
-    for player in expired_trials:
-        if check_and_handle_trial_expiry(player['id']):
-            count += 1
+def run_trial_expiry_job():
+    """Run expire_trials() every TRIAL_EXPIRY_INTERVAL_SECONDS; never returns"""
+    while True:
+        try:
+            check_bulk_trial_expiry()
+        except Exception as e:
+            logging.error(f"Error in trial expiry job: {e}")
+        time.sleep(TRIAL_EXPIRY_INTERVAL_SECONDS)
+
+
+def start_trial_expiry_scheduler():
+    """
+    Run the trial expiry job in a daemon thread of this process.
+
+    Only with TRIAL_EXPIRY_JOB_ENABLED=1: web workers leave it to the
+    designated jobs process (flask --app main run-jobs). Requests never
+    depend on it, since load_principal() and with_trial_downgrade() apply a
+    lapsed trial in memory.
+    """
+    if os.environ.get('TRIAL_EXPIRY_JOB_ENABLED', '0') != '1':
+        logging.info("Trial expiry job not started in this process "
+                     "(TRIAL_EXPIRY_JOB_ENABLED=1 or run-jobs to run it)")
+        return
+
+    threading.Thread(target=run_trial_expiry_job, name='trial-expiry',
+                     daemon=True).start()
 
-    conn.close()
-    logging.info(f"Processed {count} expired trials in bulk check")
-    return count
+
+start_trial_expiry_scheduler()
 
 
 def require_permission(permission):
@@ -1463,22 +1897,14 @@ def require_permission(permission):
                 flash('Please log in first', 'warning')
                 return redirect(url_for('player_login'))
 
-            # Check if user is admin - admins bypass all permission checks
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT is_admin FROM players WHERE id = ?',
-                           (current_player_id, ))
-            player = cursor.fetchone()
-            conn.close()
+            # One query: admin flag, permissions, and trial expiry handling
+            principal = get_current_principal()
 
-            # if player and player.get('is_admin'):
+            # if principal and principal.is_admin:
             #    return f(*args, **kwargs)  # Admin bypass
 
-            # Check and handle trial expiry first
-            check_and_handle_trial_expiry(current_player_id)
-
             # Check if user has the required permission
-            if not check_user_permission(current_player_id, permission):
+            if not principal or not principal.has_permission(permission):
                 flash(
                     'This feature requires a Premium membership. Upgrade to access all features!',
                     'warning')
@@ -1507,14 +1933,9 @@ def require_admin():
                 return redirect(url_for('player_login'))
 
             # Check if user is admin
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT is_admin FROM players WHERE id = ?',
-                           (current_player_id, ))
-            player = cursor.fetchone()
-            conn.close()
+            principal = get_current_principal()
 
-            if not player or not player.get('is_admin'):
+            if not principal or not principal.is_admin:
                 flash('Admin access required', 'danger')
                 return redirect(
                     url_for('player_home', player_id=current_player_id))
@@ -1873,6 +2294,7 @@ def create_team(player1_id, player2_id, created_by, team_name=None):
 
         conn.commit()
         conn.close()
+        invalidate_compatible_players(player1_id, player2_id)
 
         logging.info(
             f"Team {team_id} created between players {player1_id} and {player2_id}"
@@ -2243,7 +2665,7 @@ def get_player_team(player_id):
 def get_player_team_invitations(player_id):
     """Get pending team formation/pair-up requests for a player (NOT singles challenges)"""
     try:
-        conn = get_db_connection()
+        conn = get_request_db_connection()
         cur = conn.cursor()
 
         # Only get actual team formation requests, exclude singles challenges
@@ -2295,7 +2717,7 @@ def get_player_match_challenges(player_id):
 def get_player_name(player_id):
     """Get player's full name"""
     try:
-        conn = get_db_connection()
+        conn = get_request_db_connection()
         player = conn.execute('SELECT full_name FROM players WHERE id = ?',
                               (player_id, )).fetchone()
         conn.close()
@@ -2411,7 +2833,8 @@ def calculate_distance_haversine(lat1, lon1, lat2, lon2):
     Calculate the distance between two GPS coordinates using the Haversine formula.
 
     The Haversine formula calculates the great-circle distance between two points 
-    on a sphere given their latitude and longitude coordinates.
+    on a sphere given their latitude and longitude coordinates. For one origin
+    against many candidates use services.distance.distances_from instead.
 
     Args:
         lat1 (float): Latitude of the first point in decimal degrees
@@ -2425,71 +2848,112 @@ def calculate_distance_haversine(lat1, lon1, lat2, lon2):
     Example:
         >>> distance = calculate_distance_haversine(40.7128, -74.0060, 34.0522, -118.2437)  # NYC to LA
         >>> print(f"Distance: {distance:.2f} miles")
-        Distance: 2445.55 miles
+        Distance: 2445.59 miles
     """
-    try:
-        # Input validation - check for None/null values
-        if any(coord is None for coord in [lat1, lon1, lat2, lon2]):
-            logging.debug("One or more coordinates are None")
-            return None
+    return haversine_miles(lat1, lon1, lat2, lon2)
 
-        # Convert to float if they aren't already
-        lat1, lon1, lat2, lon2 = float(lat1), float(lon1), float(lat2), float(
-            lon2)
 
-        # Validate coordinate ranges
-        if not (-90 <= lat1 <= 90) or not (-90 <= lat2 <= 90):
-            logging.warning(
-                f"Invalid latitude values: lat1={lat1}, lat2={lat2}")
-            return None
+GEOCODE_HIT_TTL = timedelta(days=float(os.environ.get('GEOCODE_CACHE_TTL_DAYS', 90)))
+GEOCODE_MISS_TTL = timedelta(hours=float(os.environ.get('GEOCODE_NEGATIVE_TTL_HOURS', 24)))
 
-        if not (-180 <= lon1 <= 180) or not (-180 <= lon2 <= 180):
-            logging.warning(
-                f"Invalid longitude values: lon1={lon1}, lon2={lon2}")
-            return None
 
-        # If coordinates are identical, distance is 0
-        if lat1 == lat2 and lon1 == lon2:
-            return 0.0
+def normalize_geocode_query(text):
+    """Canonical cache key for a location query: lower-case, single-spaced"""
+    return ' '.join(str(text or '').lower().split())
 
-        # Earth's radius in miles
-        R = 3959.0
 
-        # Convert decimal degrees to radians
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
+class GeocodeCache:
+    """
+    Remote geocoder results shared by every worker (geocode_cache table), with
+    a per-process LRU in front.
 
-        # Calculate differences
-        delta_lat = lat2_rad - lat1_rad
-        delta_lon = lon2_rad - lon1_rad
+    Misses are cached too, for a shorter TTL, so a bad ZIP entered by many
+    signups costs one remote call a day instead of one per signup.
+    get() returns None when nothing is cached, (None, None) for a cached
+    miss, and (lat, lon) for a cached hit.
+    """
+
+    def __init__(self, max_entries=int(os.environ.get('GEOCODE_LRU_SIZE', 4096))):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> ((lat, lon), expires_at)
+        self._lock = threading.Lock()
+
+    def _remember(self, key, coords, expires_at):
+        with self._lock:
+            self._entries[key] = (coords, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, query):
+        key = normalize_geocode_query(query)
+        now = datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                del self._entries[key]
+
+        conn = get_request_db_connection()
+        row = conn.execute(
+            '''
+            SELECT latitude, longitude, found, expires_at FROM geocode_cache
+            WHERE query_key = ? AND expires_at > ?
+        ''', (key, now)).fetchone()
+        conn.close()
+        if not row:
+            return None
+        coords = ((row['latitude'], row['longitude'])
+                  if row['found'] else (None, None))
+        self._remember(key, coords, row['expires_at'])
+        return coords
+
+    def put(self, query, lat, lon):
+        key = normalize_geocode_query(query)
+        found = lat is not None and lon is not None
+        expires_at = datetime.now() + (GEOCODE_HIT_TTL
+                                       if found else GEOCODE_MISS_TTL)
+        conn = get_db_connection()
+        conn.execute(
+            '''
+            INSERT INTO geocode_cache (query_key, latitude, longitude, found, fetched_at, expires_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+            ON CONFLICT (query_key) DO UPDATE
+            SET latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude,
+                found = EXCLUDED.found, fetched_at = EXCLUDED.fetched_at,
+                expires_at = EXCLUDED.expires_at
+        ''', (key, lat if found else None, lon if found else None,
+              1 if found else 0, expires_at))
+        conn.commit()
+        conn.close()
+        self._remember(key, (lat, lon) if found else (None, None), expires_at)
 
-        # Haversine formula
-        a = (math.sin(delta_lat / 2)**2 + math.cos(lat1_rad) *
-             math.cos(lat2_rad) * math.sin(delta_lon / 2)**2)
+    def resolve(self, query, lookup):
+        """Return cached coordinates for query, calling lookup() and caching its answer on a miss"""
+        cached = self.get(query)
+        if cached is not None:
+            return cached
+        lat, lon = lookup()
+        self.put(query, lat, lon)
+        return lat, lon
 
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
-        # Calculate distance
-        distance = R * c
+geocode_cache = GeocodeCache()
 
-        logging.debug(
-            f"Distance calculated: {distance:.2f} miles between ({lat1}, {lon1}) and ({lat2}, {lon2})"
-        )
-        return distance
 
-    except (ValueError, TypeError) as e:
-        logging.error(f"Error calculating distance: {e}")
-        return None
-    except Exception as e:
-        logging.error(f"Unexpected error in calculate_distance_haversine: {e}")
-        return None
+def _zip_cache_key(zip_code):
+    return f"zip:{str(zip_code).strip()}"
 
 
 def get_coordinates_from_zip_code(zip_code):
     """
-    Get latitude and longitude coordinates from a ZIP code using a free geocoding service.
+    Get latitude and longitude coordinates from a ZIP code using the bundled offline gazetteer.
+
+    Never touches the network. ZIPs missing from the table fall back to
+    earlier remote answers in geocode_cache; anything still unknown can be
+    resolved later with geocode_zip_in_background().
 
     Args:
         zip_code (str): US ZIP code (5 digits)
@@ -2501,11 +2965,26 @@ def get_coordinates_from_zip_code(zip_code):
         >>> lat, lng = get_coordinates_from_zip_code("90210")
         >>> print(f"Beverly Hills, CA: {lat}, {lng}")
     """
-    try:
-        if not zip_code or len(str(zip_code).strip()) != 5:
-            logging.warning(f"Invalid ZIP code format: {zip_code}")
-            return None, None
+    if not zip_code or len(str(zip_code).strip()) != 5:
+        logging.warning(f"Invalid ZIP code format: {zip_code}")
+        return None, None
+
+    lat, lng = lookup_zip(zip_code)
+    if lat is None:
+        lat, lng = geocode_cache.get(_zip_cache_key(zip_code)) or (None, None)
+    if lat is None:
+        logging.warning(f"No coordinates found for ZIP code: {zip_code}")
+    return lat, lng
+
 
+def _geocode_zip_nominatim(zip_code):
+    """
+    Look up a ZIP code with Nominatim (OpenStreetMap); returns (lat, lng) or (None, None).
+
+    Network failures raise requests.RequestException so they are not
+    mistaken for a definitive miss and negatively cached.
+    """
+    try:
         zip_code = str(zip_code).strip()
 
         # Use Nominatim (OpenStreetMap) free geocoding service
@@ -2534,14 +3013,58 @@ def get_coordinates_from_zip_code(zip_code):
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching coordinates for ZIP {zip_code}: {e}")
-        return None, None
+        raise
     except (ValueError, KeyError, TypeError) as e:
         logging.error(f"Error parsing coordinates for ZIP {zip_code}: {e}")
         return None, None
-    except Exception as e:
-        logging.error(
-            f"Unexpected error converting ZIP {zip_code} to coordinates: {e}")
-        return None, None
+
+
+_geocode_executor = None
+_geocode_executor_lock = threading.Lock()
+
+
+def geocode_zip_in_background(player_id, zip_code):
+    """
+    Resolve a ZIP the gazetteer doesn't know via Nominatim off the request path.
+
+    When it resolves, the player's location1 is filled in, provided their
+    ZIP hasn't changed in the meantime. Disabled with ZIP_GEOCODE_FALLBACK=0.
+    """
+    global _geocode_executor
+    if os.environ.get('ZIP_GEOCODE_FALLBACK', '1') != '1' or not zip_code:
+        return
+    if geocode_cache.get(_zip_cache_key(zip_code)) is not None:
+        return  # already answered recently (a hit would have been used directly)
+    with _geocode_executor_lock:
+        if _geocode_executor is None:
+            _geocode_executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix='zip-geocode')
+
+    def resolve():
+        try:
+            lat, lng = geocode_cache.resolve(
+                _zip_cache_key(zip_code),
+                lambda: _geocode_zip_nominatim(zip_code))
+        except Exception as e:
+            logging.warning(f"Background geocode for ZIP {zip_code} failed: {e}")
+            return
+        if lat is None:
+            return
+        conn = get_db_connection()
+        try:
+            conn.execute(
+                "UPDATE players SET location1 = ? WHERE id = ? AND zip_code = ?",
+                (f"{lat},{lng}", player_id, zip_code))
+            conn.commit()
+            invalidate_compatible_players(player_id)
+            logging.info(
+                f"Background geocode set location1 for player {player_id} (ZIP {zip_code})")
+        except Exception as e:
+            logging.error(f"Error storing background geocode for player {player_id}: {e}")
+        finally:
+            conn.close()
+
+    _geocode_executor.submit(resolve)
 
 
 def validate_tournament_join_gps(user_latitude,
@@ -3060,200 +3583,264 @@ def schedule_tournament_notifications():
     conn.close()
 
 
-def get_tournament_levels():
-    """Get available tournament levels with dynamic pricing from settings"""
-    beginner_price = float(get_setting('beginner_price', '20'))
-    intermediate_price = float(get_setting('intermediate_price', '25'))
-    advanced_price = float(get_setting('advanced_price', '30'))
-    championship_price = float(get_setting('championship_price', '30'))
-
-    # Get max players from settings
-    beginner_max = int(get_setting('beginner_max_players', '32'))
-    intermediate_max = int(get_setting('intermediate_max_players', '32'))
-    advanced_max = int(get_setting('advanced_max_players', '32'))
-    championship_max = int(get_setting('championship_max_players', '128'))
-
-    def calculate_prizes(entry_fee, max_players):
-        """Calculate prize breakdown for top 4 finishers"""
-        total_fees = entry_fee * max_players
-        prize_pool = total_fees * 0.70  # 70% goes to prizes, 30% platform revenue
-        return {
-            '1st': prize_pool * 0.50,  # 50% of prize pool (35% of total fees)
-            '2nd': prize_pool * 0.30,  # 30% of prize pool (21% of total fees)
-            '3rd': prize_pool * 0.12,  # 12% of prize pool (8.4% of total fees)
-            '4th': prize_pool * 0.08,  # 8% of prize pool (5.6% of total fees)
-            'platform_revenue': total_fees * 0.30  # 30% platform revenue
-        }
-
-    def calculate_championship_prizes(entry_fee, max_players):
-        """Calculate detailed prize breakdown for championship tournament (top 20)"""
-        total_fees = entry_fee * max_players  # $30 * 128 = $3,840
-        prize_pool = total_fees * 0.70  # $2,688 prize pool
-        return {
-            '1st': 800,
-            '2nd': 480,
-            '3rd': 300,
-            '4th': 200,
-            '5th': 160,
-            '6th': 120,
-            '7th': 100,
-            '8th': 80,
-            '9th': 72,
-            '10th': 64,
-            '11th': 56,
-            '12th': 48,
-            '13th': 44,
-            '14th': 40,
-            '15th': 36,
-            '16th': 32,
-            '17th': 32,
-            '18th': 32,
-            '19th': 16,
-            '20th': 16,
-            'platform_revenue': total_fees * 0.30
-        }
+def calculate_prizes(entry_fee, max_players):
+    """Calculate prize breakdown for top 4 finishers"""
+    total_fees = entry_fee * max_players
+    prize_pool = total_fees * 0.70  # 70% goes to prizes, 30% platform revenue
+    return {
+        '1st': prize_pool * 0.50,  # 50% of prize pool (35% of total fees)
+        '2nd': prize_pool * 0.30,  # 30% of prize pool (21% of total fees)
+        '3rd': prize_pool * 0.12,  # 12% of prize pool (8.4% of total fees)
+        '4th': prize_pool * 0.08,  # 8% of prize pool (5.6% of total fees)
+        'platform_revenue': total_fees * 0.30  # 30% platform revenue
+    }
 
-    beginner_prizes = calculate_prizes(beginner_price, beginner_max)
-    intermediate_prizes = calculate_prizes(intermediate_price,
-                                           intermediate_max)
-    advanced_prizes = calculate_prizes(advanced_price, advanced_max)
-    championship_prizes = calculate_championship_prizes(
-        championship_price, championship_max)
 
+def calculate_championship_prizes(entry_fee, max_players):
+    """Calculate detailed prize breakdown for championship tournament (top 20)"""
+    total_fees = entry_fee * max_players  # $30 * 128 = $3,840
+    prize_pool = total_fees * 0.70  # $2,688 prize pool
     return {
-        'Beginner': {
-            'name': 'The B League',
-            'description': 'Perfect for new players and casual competition',
-            'entry_fee': beginner_price,
-            'prize_pool':
-            f"1st: ${beginner_prizes['1st']:.0f} • 2nd: ${beginner_prizes['2nd']:.0f} • 3rd: ${beginner_prizes['3rd']:.0f} • 4th: ${beginner_prizes['4th']:.0f}",
-            'prize_breakdown': beginner_prizes,
-            'skill_requirements': 'Beginner level players',
-            'max_players': beginner_max
-        },
-        'Intermediate': {
-            'name': 'The Inter League',
-            'description': 'For players with solid fundamentals',
-            'entry_fee': intermediate_price,
-            'prize_pool':
-            f"1st: ${intermediate_prizes['1st']:.0f} • 2nd: ${intermediate_prizes['2nd']:.0f} • 3rd: ${intermediate_prizes['3rd']:.0f} • 4th: ${intermediate_prizes['4th']:.0f}",
-            'prize_breakdown': intermediate_prizes,
-            'skill_requirements': 'Intermediate level players',
-            'max_players': intermediate_max
-        },
-        'Advanced': {
-            'name': 'The Z League',
-            'description': 'High-level competitive play',
-            'entry_fee': advanced_price,
-            'prize_pool':
-            f"1st: ${advanced_prizes['1st']:.0f} • 2nd: ${advanced_prizes['2nd']:.0f} • 3rd: ${advanced_prizes['3rd']:.0f} • 4th: ${advanced_prizes['4th']:.0f}",
-            'prize_breakdown': advanced_prizes,
-            'skill_requirements': 'Advanced level players',
-            'max_players': advanced_max
-        },
-        'Championship': {
-            'name':
-            'The Big Dink',
-            'subtitle':
-            'The Hill',
-            'description':
-            'Elite championship tournament for top players',
-            'entry_fee':
-            championship_price,
-            'prize_pool':
-            "Total Prize Pool: $2,688 • 1st Place: $800 • Top 20 Finishers Paid",
-            'prize_breakdown':
-            championship_prizes,
-            'skill_requirements':
-            'All skill levels welcome',
-            'max_players':
-            championship_max,
-            'special_notes':
-            'Championship tournament with detailed prize distribution for top 20 finishers'
-        },
-        'Invitational': {
-            'name':
-            'The Championship',
-            'description':
-            'End of year tournament, invitation only, top 16 ranked players - Best of 5 Sets',
-            'entry_fee':
-            0,
-            'prize_pool':
-            'Details to come',
-            'prize_breakdown': {},
-            'skill_requirements':
-            'Invitation only - Top 16 ranked players',
-            'max_players':
-            16,
-            'special_notes':
-            'Invitation-only tournament for elite players - Premium best of 5 sets format'
-        }
+        '1st': 800,
+        '2nd': 480,
+        '3rd': 300,
+        '4th': 200,
+        '5th': 160,
+        '6th': 120,
+        '7th': 100,
+        '8th': 80,
+        '9th': 72,
+        '10th': 64,
+        '11th': 56,
+        '12th': 48,
+        '13th': 44,
+        '14th': 40,
+        '15th': 36,
+        '16th': 32,
+        '17th': 32,
+        '18th': 32,
+        '19th': 16,
+        '20th': 16,
+        'platform_revenue': total_fees * 0.30
     }
 
 
-def suggest_match_time(player1, player2):
-    """Suggest a match time based on both players' availability"""
-    try:
-        from datetime import datetime, timedelta
-        import json
+@lru_cache(maxsize=256)
+def format_prize_pool(entry_fee, max_players):
+    """Top-4 prize string shown on tournament cards, e.g. '1st: $224 • 2nd: $134 • ...'"""
+    prizes = calculate_prizes(float(entry_fee), int(max_players))
+    return (f"1st: ${prizes['1st']:.0f} • 2nd: ${prizes['2nd']:.0f} • "
+            f"3rd: ${prizes['3rd']:.0f} • 4th: ${prizes['4th']:.0f}")
 
-        # Get player availability schedules
-        p1_schedule = json.loads(player1['availability_schedule']
-                                 ) if player1['availability_schedule'] else {}
-        p2_schedule = json.loads(player2['availability_schedule']
-                                 ) if player2['availability_schedule'] else {}
 
-        # Days of the week to check (next 7 days)
-        days = [
-            'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday',
-            'sunday'
-        ]
+def _freeze(value):
+    """Recursively wrap dicts in read-only mappings so shared data can't be mutated by a route."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    return value
+
+
+class TournamentCatalogue:
+    """
+    Immutable tournament level catalogue for one settings version.
+
+    Built once per SettingsCache.version and shared by every request, so
+    routes read prize tables and strings instead of recomputing them.
+    """
+
+    __slots__ = ('version', 'levels')
+
+    def __init__(self, version, levels):
+        self.version = version
+        self.levels = _freeze(levels)
+
+    def get(self, level, default=None):
+        return self.levels.get(level, default)
+
+    @classmethod
+    def from_settings(cls, version):
+        beginner_price = float(get_setting('beginner_price', '20'))
+        intermediate_price = float(get_setting('intermediate_price', '25'))
+        advanced_price = float(get_setting('advanced_price', '30'))
+        championship_price = float(get_setting('championship_price', '30'))
+
+        # Get max players from settings
+        beginner_max = int(get_setting('beginner_max_players', '32'))
+        intermediate_max = int(get_setting('intermediate_max_players', '32'))
+        advanced_max = int(get_setting('advanced_max_players', '32'))
+        championship_max = int(get_setting('championship_max_players', '128'))
+
+        # Level templates carry no live entry counts, so they never show open spots
+        levels = {
+            'Beginner': {
+                'name': 'The B League',
+                'description': 'Perfect for new players and casual competition',
+                'entry_fee': beginner_price,
+                'prize_pool': format_prize_pool(beginner_price, beginner_max),
+                'prize_breakdown': calculate_prizes(beginner_price,
+                                                    beginner_max),
+                'skill_requirements': 'Beginner level players',
+                'max_players': beginner_max,
+                'spots_remaining': 0
+            },
+            'Intermediate': {
+                'name': 'The Inter League',
+                'description': 'For players with solid fundamentals',
+                'entry_fee': intermediate_price,
+                'prize_pool': format_prize_pool(intermediate_price,
+                                                intermediate_max),
+                'prize_breakdown': calculate_prizes(intermediate_price,
+                                                    intermediate_max),
+                'skill_requirements': 'Intermediate level players',
+                'max_players': intermediate_max,
+                'spots_remaining': 0
+            },
+            'Advanced': {
+                'name': 'The Z League',
+                'description': 'High-level competitive play',
+                'entry_fee': advanced_price,
+                'prize_pool': format_prize_pool(advanced_price, advanced_max),
+                'prize_breakdown': calculate_prizes(advanced_price,
+                                                    advanced_max),
+                'skill_requirements': 'Advanced level players',
+                'max_players': advanced_max,
+                'spots_remaining': 0
+            },
+            'Championship': {
+                'name':
+                'The Big Dink',
+                'subtitle':
+                'The Hill',
+                'description':
+                'Elite championship tournament for top players',
+                'entry_fee':
+                championship_price,
+                'prize_pool':
+                "Total Prize Pool: $2,688 • 1st Place: $800 • Top 20 Finishers Paid",
+                'prize_breakdown':
+                calculate_championship_prizes(championship_price,
+                                              championship_max),
+                'skill_requirements':
+                'All skill levels welcome',
+                'max_players':
+                championship_max,
+                'spots_remaining':
+                0,
+                'special_notes':
+                'Championship tournament with detailed prize distribution for top 20 finishers'
+            },
+            'Invitational': {
+                'name':
+                'The Championship',
+                'description':
+                'End of year tournament, invitation only, top 16 ranked players - Best of 5 Sets',
+                'entry_fee':
+                0,
+                'prize_pool':
+                'Details to come',
+                'prize_breakdown': {},
+                'skill_requirements':
+                'Invitation only - Top 16 ranked players',
+                'max_players':
+                16,
+                'spots_remaining':
+                0,
+                'special_notes':
+                'Invitation-only tournament for elite players - Premium best of 5 sets format'
+            }
+        }
+        return cls(version, levels)
+
+
+_tournament_catalogue = None
+_tournament_catalogue_lock = threading.Lock()
+
 
-        # Find overlapping available times
-        suggested_times = []
+def get_tournament_catalogue():
+    """Return the shared TournamentCatalogue, rebuilding it only when settings change"""
+    global _tournament_catalogue
+    settings_cache.refresh_if_stale()
+    catalogue = _tournament_catalogue
+    if catalogue is None or catalogue.version != settings_cache.version:
+        with _tournament_catalogue_lock:
+            if (_tournament_catalogue is None or
+                    _tournament_catalogue.version != settings_cache.version):
+                _tournament_catalogue = TournamentCatalogue.from_settings(
+                    settings_cache.version)
+            catalogue = _tournament_catalogue
+    return catalogue
+
+
+def get_tournament_levels():
+    """Get available tournament levels with dynamic pricing from settings (read-only)"""
+    return get_tournament_catalogue().levels
+
+
+def player_availability_mask(player):
+    """
+    Weekly availability bitmask for a players row (see services/availability.py).
+
+    Uses the stored availability_mask; rows not yet rebuilt for the current
+    slot size fall back to decoding availability_schedule.
+    """
+    if player.get('availability_slot_minutes') == AVAILABILITY_SLOT_MINUTES:
+        mask = bits_to_mask(player.get('availability_mask'))
+        if mask is not None:
+            return mask
+    if not player.get('availability_schedule'):
+        return 0
+    try:
+        return schedule_to_mask(json.loads(player['availability_schedule']))
+    except (TypeError, ValueError):
+        return 0
 
-        for day in days:
-            p1_day = p1_schedule.get(day, {})
-            p2_day = p2_schedule.get(day, {})
 
-            # If both players are available this day
-            if (p1_day.get('available') and p2_day.get('available')):
-                p1_times = set(p1_day.get('time_slots', []))
-                p2_times = set(p2_day.get('time_slots', []))
+def suggest_match_time(player1, player2):
+    """Suggest a match time based on both players' availability"""
+    try:
+        p1_mask = player_availability_mask(player1)
+        p2_mask = player_availability_mask(player2)
 
-                # Find common time slots
-                common_times = p1_times.intersection(
-                    p2_times) if p2_times else p1_times
+        # A player without a schedule fits around the other one
+        if p1_mask and p2_mask:
+            common = p1_mask & p2_mask
+        else:
+            common = p1_mask or p2_mask
 
-                if common_times:
-                    for time_slot in common_times:
-                        suggested_times.append(f"{day.title()} {time_slot}")
-                elif p1_times and not p2_schedule:  # Player 2 has no schedule, use Player 1's
-                    for time_slot in p1_times:
-                        suggested_times.append(f"{day.title()} {time_slot}")
+        suggested_time = first_slot(common)
+        if suggested_time:
+            return suggested_time
 
         # If no specific overlapping times found, provide default suggestions
-        if not suggested_times:
-            # Check time preferences
-            p1_pref = player1['time_preference'] if player1[
-                'time_preference'] else 'Flexible'
-            p2_pref = player2['time_preference'] if player2[
-                'time_preference'] else 'Flexible'
-
-            if p1_pref == p2_pref and p1_pref != 'Flexible':
-                return f"This week - {p1_pref}"
-            else:
-                return "This week - Flexible timing (coordinate with opponent)"
+        p1_pref = player1['time_preference'] if player1[
+            'time_preference'] else 'Flexible'
+        p2_pref = player2['time_preference'] if player2[
+            'time_preference'] else 'Flexible'
 
-        # Return the first suggested time
-        return suggested_times[
-            0] if suggested_times else "This week - Flexible timing"
+        if p1_pref == p2_pref and p1_pref != 'Flexible':
+            return f"This week - {p1_pref}"
+        else:
+            return "This week - Flexible timing (coordinate with opponent)"
 
     except Exception as e:
         logging.error(f"Error suggesting match time: {e}")
         return "This week - Flexible timing"
 
 
+# Rank candidates by weekly slots shared with the searcher's mask; NULL (sorted
+# last) when either mask is missing or was built with another slot size
+AVAILABILITY_OVERLAP_SQL = (
+    "CASE WHEN availability_slot_minutes = ? "
+    "AND length(availability_mask) = length(CAST(? AS BIT VARYING)) "
+    "THEN bit_count(availability_mask & CAST(? AS BIT VARYING)) END")
+
+
+def availability_overlap_params(player):
+    """Parameters for AVAILABILITY_OVERLAP_SQL, for the searcher's mask"""
+    bits = mask_to_bits(player_availability_mask(player))
+    return (AVAILABILITY_SLOT_MINUTES, bits, bits)
+
+
 def get_filtered_compatible_players(current_player_id,
                                     match_type=None,
                                     skill_level=None,
@@ -3263,7 +3850,7 @@ def get_filtered_compatible_players(current_player_id,
     - skill_level
     - match_type (optional)
     - player's own search_radius_miles
-    - geographic distance using the location1 field ('lat,lon')
+    - geographic distance using the latitude/longitude columns
     """
     conn = get_db_connection()
     conn.row_factory = sqlite3.Row
@@ -3271,7 +3858,7 @@ def get_filtered_compatible_players(current_player_id,
     # Fetch current player info
     current_player = conn.execute(
         '''
-        SELECT id, username, full_name, location1, search_radius_miles
+        SELECT id, username, full_name, latitude, longitude, search_radius_miles
         FROM players
         WHERE id = ?
     ''', (current_player_id, )).fetchone()
@@ -3284,7 +3871,7 @@ def get_filtered_compatible_players(current_player_id,
     base_query = '''
         SELECT id, username, full_name, skill_level, selfie,
                wins, losses, ranking_points, gender,
-               location1, search_radius_miles
+               location1, latitude, longitude, search_radius_miles
         FROM players
         WHERE id != ? AND account_status = 'active'
     '''
@@ -3298,23 +3885,33 @@ def get_filtered_compatible_players(current_player_id,
         base_query += ' AND (match_preference = ? OR match_preference IS NULL)'
         params.append(match_type)
 
+    max_distance = distance or current_player["search_radius_miles"] or 15
+    current_lat = current_player["latitude"]
+    current_lon = current_player["longitude"]
+
+    # Only scan grid cells / the bounding box that can hold players within range
+    if current_lat is not None and current_lon is not None:
+        base_query += (' AND geo_cell = ANY(?)'
+                       ' AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?')
+        params.append(cells_within(current_lat, current_lon, max_distance))
+        params.extend(bounding_box(current_lat, current_lon, max_distance))
+
     all_players = conn.execute(base_query, params).fetchall()
     conn.close()
 
-    # --- Distance filtering ---
-    max_distance = distance or current_player["search_radius_miles"] or 15
-    current_loc = current_player["location1"]
+    # --- Distance filtering (one batch pass over the typed columns) ---
+    distances = distances_from(current_lat, current_lon,
+                               [p["latitude"] for p in all_players],
+                               [p["longitude"] for p in all_players])
 
     results = []
-    for p in all_players:
+    for p, dist in zip(all_players, distances):
         player_dict = dict(p)
 
-        # Calculate distance based on location1 text "lat,lon"
-        dist = calculate_distance_from_location1(current_loc, p["location1"])
+        dist = round(dist, 1) if dist is not None else None
         if dist is not None and dist <= max_distance:
             player_dict["distance_miles"] = dist
-            player_dict["distance_display"] = ("< 1 mile away" if dist < 1 else
-                                               f"~{round(dist, 1)} miles away")
+            player_dict["distance_display"] = format_distance_display(dist)
 
             # --- Ensure essential fields are safe defaults ---
             player_dict["ranking_points"] = p["ranking_points"] if p[
@@ -3333,8 +3930,34 @@ def get_filtered_compatible_players(current_player_id,
     return results
 
 
+compatible_player_cache = CompatiblePlayerCache(
+    backend_from_env(), ttl=float(os.environ.get('COMPAT_CACHE_TTL', 300)))
+
+
+def invalidate_compatible_players(*player_ids):
+    """Forget cached candidate lists for these players and for anyone whose list includes them"""
+    compatible_player_cache.invalidate(*player_ids)
+
+
+def player_updated(*player_ids):
+    """Call after committing a players write that may touch auth and matching columns alike"""
+    forget_principal(*player_ids)
+    invalidate_compatible_players(*player_ids)
+
+
+def _compatible_cache_state(player):
+    """The searcher fields a cached candidate list depends on"""
+    return (player['skill_level'], player['latitude'], player['longitude'],
+            player['search_radius_miles'], player['location1'])
+
+
 def get_compatible_players(player_id):
-    """Get list of compatible players using GPS-based distance filtering."""
+    """
+    Get list of compatible players using GPS-based distance filtering.
+
+    Candidate ids and distances are cached per player (compatible_player_cache);
+    a hit only re-reads the candidate rows by id.
+    """
     conn = get_db_connection()
     conn.row_factory = sqlite3.Row
 
@@ -3350,10 +3973,39 @@ def get_compatible_players(player_id):
     player_lat = player['latitude']
     player_lng = player['longitude']
 
+    cache_state = _compatible_cache_state(player)
+    cached = compatible_player_cache.get(player_id, cache_state)
+
+    # --------------------------
+    #  Cached candidate list
+    # --------------------------
+    if cached is not None:
+        rows = conn.execute(
+            '''
+            SELECT id, username, full_name, first_name, last_name, location1 AS location,
+                   skill_level, preferred_court, wins, losses, ranking_points,
+                   selfie, latitude, longitude, gender, search_radius_miles AS travel_radius
+            FROM players
+            WHERE id = ANY(?) AND is_looking_for_match = 1
+        ''', ([cid for cid, _ in cached], )).fetchall()
+        rows_by_id = {row['id']: row for row in rows}
+
+        compatible_players = []
+        for cid, distance in cached:
+            if cid not in rows_by_id:
+                continue
+            candidate_dict = dict(rows_by_id[cid])
+            if distance is not None:
+                candidate_dict['distance_miles'] = distance
+            if player_lat is not None and player_lng is not None:
+                candidate_dict['candidate_travel_radius'] = candidate_dict[
+                    'travel_radius'] or 25
+            compatible_players.append(candidate_dict)
+
     # --------------------------
     #  Fallback (no GPS coords)
     # --------------------------
-    if player_lat is None or player_lng is None:
+    elif player_lat is None or player_lng is None:
         logging.warning(
             f"Player {player_id} has no GPS coordinates, using fallback matching"
         )
@@ -3401,6 +4053,23 @@ def get_compatible_players(player_id):
                 if compatible_players:
                     break
 
+        # Estimate distances from location text in one pass for the card display
+        origin_lat, origin_lon = estimate_coordinates_from_location(
+            player['location1'])
+        estimated = estimate_coordinates_for_locations(
+            [c['location'] if c['latitude'] is None else None
+             for c in compatible_players])
+        distances = distances_from(
+            origin_lat, origin_lon,
+            [c['latitude'] if c['latitude'] is not None else est[0]
+             for c, est in zip(compatible_players, estimated)],
+            [c['longitude'] if c['longitude'] is not None else est[1]
+             for c, est in zip(compatible_players, estimated)])
+        compatible_players = [
+            dict(c, distance_miles=round(d, 1)) if d is not None else c
+            for c, d in zip(compatible_players, distances)
+        ]
+
     # --------------------------
     #  GPS-based matching
     # --------------------------
@@ -3413,18 +4082,24 @@ def get_compatible_players(player_id):
             WHERE id != ?
               AND is_looking_for_match = 1
               AND skill_level = ?
-              AND latitude IS NOT NULL
-              AND longitude IS NOT NULL
+              AND latitude BETWEEN ? AND ?
+              AND longitude BETWEEN ? AND ?
+              AND geo_cell = ANY(?)
             ORDER BY ranking_points DESC, wins DESC, created_at ASC
         '''
         all_players = conn.execute(
-            query, (player_id, player['skill_level'])).fetchall()
+            query,
+            (player_id, player['skill_level'],
+             *bounding_box(player_lat, player_lng, player_travel_radius),
+             cells_within(player_lat, player_lng,
+                          player_travel_radius))).fetchall()
+
+        distances = distances_from(player_lat, player_lng,
+                                   [c['latitude'] for c in all_players],
+                                   [c['longitude'] for c in all_players])
 
         compatible_players = []
-        for candidate in all_players:
-            distance = calculate_distance_haversine(player_lat, player_lng,
-                                                    candidate['latitude'],
-                                                    candidate['longitude'])
+        for candidate, distance in zip(all_players, distances):
             if distance is not None:
                 candidate_travel_radius = candidate[
                     'travel_radius'] if candidate['travel_radius'] else 25
@@ -3441,6 +4116,12 @@ def get_compatible_players(player_id):
             f"GPS-based matching for player {player_id}: found {len(compatible_players)} within {player_travel_radius} miles."
         )
 
+    if cached is None:
+        compatible_player_cache.put(
+            player_id, cache_state,
+            [(c['id'], c['distance_miles'] if 'distance_miles' in c else None)
+             for c in compatible_players])
+
     # --------------------------
     #  Build clean dicts
     # --------------------------
@@ -3471,6 +4152,8 @@ def get_compatible_players(player_id):
 
         if 'distance_miles' in p:
             player_data['distance_miles'] = p['distance_miles']
+            player_data['distance_display'] = format_distance_display(
+                p['distance_miles'])
         if 'candidate_travel_radius' in p:
             player_data['candidate_travel_radius'] = p[
                 'candidate_travel_radius']
@@ -3481,6 +4164,199 @@ def get_compatible_players(player_id):
     return players_list
 
 
+BROWSE_PAGE_SIZE = int(os.environ.get('BROWSE_PAGE_SIZE', 24))
+
+# Great-circle miles from (?, ?, ?) = (origin lat, origin lat, origin lon), rounded
+# to 0.1 so the pagination cursor compares exactly; 3958.8 = services.distance.EARTH_RADIUS_MILES
+_SQL_DISTANCE_MILES = '''ROUND((2 * 3958.8 * ASIN(LEAST(1.0, SQRT(
+               POWER(SIN(RADIANS(latitude - ?) / 2), 2)
+               + COS(RADIANS(?)) * COS(RADIANS(latitude))
+               * POWER(SIN(RADIANS(longitude - ?) / 2), 2)))))::numeric, 1)::float8'''
+
+
+def encode_browse_cursor(key):
+    """Signed, URL-safe cursor for a (distance, -ranking_points, id) sort key"""
+    return serializer.dumps(list(key), salt='browse-cursor')
+
+
+def decode_browse_cursor(cursor):
+    """Inverse of encode_browse_cursor(); raises ValueError for a bad or tampered cursor"""
+    try:
+        distance, neg_points, player_id = serializer.loads(cursor,
+                                                           salt='browse-cursor')
+        return float(distance), int(neg_points), int(player_id)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+
+def _browse_sort_key(player):
+    distance = player.get('distance_miles')
+    return (distance if distance is not None else 1e9,
+            -(player.get('ranking_points') or 0), player['id'])
+
+
+def _browse_page_in_memory(players, after, limit):
+    """Keyset-page an already loaded candidate list"""
+    ordered = sorted((dict(p) for p in players), key=_browse_sort_key)
+    if after is not None:
+        ordered = [p for p in ordered if _browse_sort_key(p) > after]
+    page = ordered[:limit]
+    next_cursor = (encode_browse_cursor(_browse_sort_key(page[-1]))
+                   if len(ordered) > limit else None)
+    return page, next_cursor
+
+
+def get_browse_players_page(player_id,
+                            cursor=None,
+                            limit=BROWSE_PAGE_SIZE,
+                            match_type=None,
+                            skill_level=None,
+                            distance=None):
+    """
+    One page of browse-players cards, ordered by (distance, -ranking_points, id).
+
+    Without filters the candidates are those of get_compatible_players(),
+    read through compatible_player_cache: a miss fills it via
+    get_compatible_players(), and pages are then fetched by primary key
+    from the cached candidate ids. With filters, those of
+    get_filtered_compatible_players(), scanned from the geo cells and
+    bounding box. When the searcher has coordinates the ordering, radius
+    check and cursor are pushed into SQL, so only a page is transferred and
+    rendered - but the distance expression is still computed and sorted
+    for every candidate on each page, so the cost grows with the number of
+    nearby players, not just the page size. Returns (players, next_cursor);
+    next_cursor is None on the last page. Raises ValueError for an invalid
+    cursor.
+    """
+    after = decode_browse_cursor(cursor) if cursor else None
+    filtered = bool(match_type or skill_level or distance)
+
+    conn = get_request_db_connection()
+    searcher = conn.execute(
+        '''
+        SELECT id, latitude, longitude, skill_level, search_radius_miles,
+               is_looking_for_match, location1
+        FROM players
+        WHERE id = ?
+    ''', (player_id, )).fetchone()
+    conn.close()
+    if not searcher:
+        return [], None
+
+    lat, lon = searcher['latitude'], searcher['longitude']
+    if lat is None or lon is None:
+        # Nothing to range-scan without an origin; page the legacy list instead
+        if filtered:
+            players = get_filtered_compatible_players(player_id,
+                                                      match_type=match_type,
+                                                      skill_level=skill_level,
+                                                      distance=distance)
+        else:
+            players = get_compatible_players(player_id)
+        return _browse_page_in_memory(players, after, limit)
+
+    if filtered:
+        radius = distance or searcher['search_radius_miles'] or 15
+        conditions = ["account_status = 'active'"]
+        params = []
+        if skill_level:
+            conditions.append('skill_level = ?')
+            params.append(skill_level)
+        if match_type:
+            conditions.append(
+                '(match_preference = ? OR match_preference IS NULL)')
+            params.append(match_type)
+        within = 'distance_miles <= ?'
+        scope = 'geo_cell = ANY(?) AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?'
+        scope_params = [cells_within(lat, lon, radius), *bounding_box(lat, lon, radius)]
+    else:
+        if not searcher['is_looking_for_match']:
+            return [], None
+        radius = searcher['search_radius_miles'] or 25
+        conditions = ['is_looking_for_match = 1', 'skill_level = ?']
+        params = [searcher['skill_level']]
+        # Both players must be willing to travel the distance
+        within = 'distance_miles <= ? AND distance_miles <= travel_radius'
+        cache_state = _compatible_cache_state(searcher)
+        cached = compatible_player_cache.get(player_id, cache_state)
+        if cached is None:
+            get_compatible_players(player_id)  # fills the cache
+            cached = compatible_player_cache.get(player_id, cache_state)
+        if cached is not None:
+            scope = 'id = ANY(?)'
+            scope_params = [[cid for cid, _ in cached]]
+        else:
+            # Cache backend unavailable: scan the area directly
+            scope = 'geo_cell = ANY(?) AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?'
+            scope_params = [cells_within(lat, lon, radius), *bounding_box(lat, lon, radius)]
+
+    query = f'''
+        SELECT * FROM (
+            SELECT id, username, full_name, first_name, skill_level, selfie, gender,
+                   COALESCE(wins, 0) AS wins, COALESCE(losses, 0) AS losses,
+                   COALESCE(ranking_points, 0) AS ranking_points,
+                   COALESCE(search_radius_miles, 25) AS travel_radius,
+                   {_SQL_DISTANCE_MILES} AS distance_miles
+            FROM players
+            WHERE id != ? AND {' AND '.join(conditions)}
+              AND {scope}
+        ) candidates
+        WHERE {within}
+    '''
+    params = [lat, lat, lon, player_id, *params, *scope_params, radius]
+    if after is not None:
+        query += ' AND (distance_miles, -ranking_points, id) > (?, ?, ?)'
+        params.extend(after)
+    query += ' ORDER BY distance_miles, ranking_points DESC, id LIMIT ?'
+    params.append(limit + 1)
+
+    conn = get_request_db_connection()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+
+    players = []
+    for row in rows[:limit]:
+        player = dict(row)
+        player['name'] = (player['username'] or player['first_name']
+                          or (player['full_name'].split()[0]
+                              if player['full_name'] else 'Unknown'))
+        player['gender'] = player['gender'] or 'Prefer not to say'
+        player['distance_display'] = format_distance_display(
+            player['distance_miles'])
+        players.append(player)
+
+    next_cursor = (encode_browse_cursor(_browse_sort_key(players[-1]))
+                   if len(rows) > limit else None)
+    return players, next_cursor
+
+
+def enqueue_random_matchup(reason, *player_ids):
+    """
+    Queue players who just became available for the incremental random
+    matchup worker (RandomMatchupEngine.process_matchup_queue). Only players
+    looking for a match are queued; failures are logged, never raised.
+    """
+    player_ids = [pid for pid in player_ids if pid]
+    if not player_ids:
+        return
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            """
+            INSERT INTO matchup_queue (player_id, reason, enqueued_at)
+            SELECT id, ?, CURRENT_TIMESTAMP FROM players
+            WHERE id = ANY(?) AND is_looking_for_match = 1
+            ON CONFLICT (player_id) DO UPDATE
+            SET reason = EXCLUDED.reason, enqueued_at = EXCLUDED.enqueued_at,
+                attempted_at = NULL
+            """, (reason, player_ids))
+        conn.commit()
+    except Exception as e:
+        logging.error(f"Error queueing players {player_ids} for random matchups: {e}")
+    finally:
+        conn.close()
+
+
 def find_match_for_player(player_id):
     """Find and create a match for a player using GPS-based distance filtering"""
     conn = get_db_connection()
@@ -3493,32 +4369,35 @@ def find_match_for_player(player_id):
         return None
 
     # Get player's search radius and GPS coordinates
-    search_radius = player.get('search_radius_miles', 15)
+    search_radius = player.get('search_radius_miles') or 15
     player_lat = player.get('latitude')
     player_lng = player.get('longitude')
 
     # If player has GPS coordinates, use GPS-based matching
     if player_lat is not None and player_lng is not None:
-        # Get all players with same skill level and GPS coordinates
-        query = '''
+        # Same skill level and GPS coordinates, best schedule overlap first
+        query = f'''
             SELECT * FROM players 
             WHERE id != ? 
             AND is_looking_for_match = 1
             AND skill_level = ?
-            AND latitude IS NOT NULL 
-            AND longitude IS NOT NULL
-            ORDER BY created_at ASC
+            AND latitude BETWEEN ? AND ?
+            AND longitude BETWEEN ? AND ?
+            AND geo_cell = ANY(?)
+            ORDER BY {AVAILABILITY_OVERLAP_SQL} DESC NULLS LAST, created_at ASC
         '''
 
         all_candidates = conn.execute(
-            query, (player_id, player['skill_level'])).fetchall()
+            query, (player_id, player['skill_level'],
+                    *bounding_box(player_lat, player_lng, search_radius),
+                    cells_within(player_lat, player_lng, search_radius),
+                    *availability_overlap_params(player))).fetchall()
 
         # Filter by distance and find first match within radius
-        for candidate in all_candidates:
-            distance = calculate_distance_haversine(player_lat, player_lng,
-                                                    candidate['latitude'],
-                                                    candidate['longitude'])
-
+        distances = distances_from(player_lat, player_lng,
+                                   [c['latitude'] for c in all_candidates],
+                                   [c['longitude'] for c in all_candidates])
+        for candidate, distance in zip(all_candidates, distances):
             if distance is not None and distance <= search_radius:
                 potential_matches = candidate
                 break
@@ -3547,11 +4426,12 @@ def find_match_for_player(player_id):
             AND is_looking_for_match = 1
             AND skill_level = ?
             AND {location_condition}
-            ORDER BY created_at ASC
+            ORDER BY {AVAILABILITY_OVERLAP_SQL} DESC NULLS LAST, created_at ASC
             LIMIT 1
         '''
 
-        params = [player_id, player['skill_level']] + location_params
+        params = ([player_id, player['skill_level']] + location_params +
+                  list(availability_overlap_params(player)))
         potential_matches = conn.execute(query, params).fetchone()
 
     if potential_matches:
@@ -3681,7 +4561,110 @@ def init_db():
         print(f"❌ Database initialization error: {e}") 
     finally:
         cursor.close()
-        
+
+    backfill_player_coordinates()
+    backfill_availability_masks()
+
+
+PLAYER_COORD_BACKFILL_BATCH = int(
+    os.environ.get('PLAYER_COORD_BACKFILL_BATCH', 1000))
+
+# Same 'lat,lon' pattern as players_set_geo_cell() in schema.sql
+_LOCATION1_COORDS_SQL_RE = r'^\s*-{0,1}[0-9]+(\.[0-9]+){0,1}\s*,\s*-{0,1}[0-9]+(\.[0-9]+){0,1}\s*$'
+
+
+def backfill_player_coordinates(batch_size=PLAYER_COORD_BACKFILL_BATCH):
+    """
+    Copy 'lat,lon' location1 text into players.latitude/longitude (and geo_cell)
+    for rows written before trg_players_geo_cell kept them in sync.
+
+    Walks players by id, one committed batch at a time, so no long-held row
+    locks; safe to re-run. Returns the number of rows touched.
+    """
+    conn = get_db_connection()
+    last_id, touched = 0, 0
+    try:
+        while True:
+            # The no-op SET fires the trigger, which does the actual parsing
+            rows = conn.execute(
+                '''
+                UPDATE players SET location1 = location1
+                WHERE id IN (
+                    SELECT id FROM players
+                    WHERE id > ?
+                      AND ((latitude IS NULL AND location1 ~ ?)
+                           OR (latitude IS NOT NULL AND geo_cell IS NULL))
+                    ORDER BY id
+                    LIMIT ?
+                )
+                RETURNING id
+            ''', (last_id, _LOCATION1_COORDS_SQL_RE, batch_size)).fetchall()
+            conn.commit()
+            if not rows:
+                break
+            touched += len(rows)
+            last_id = max(row['id'] for row in rows)
+        if touched:
+            logging.info(f"Backfilled coordinates for {touched} players")
+        return touched
+    except Exception as e:
+        conn.rollback()
+        logging.error(f"Coordinate backfill stopped after id {last_id}: {e}")
+        return touched
+    finally:
+        conn.close()
+
+
+def backfill_availability_masks(batch_size=PLAYER_COORD_BACKFILL_BATCH):
+    """
+    Build players.availability_mask from availability_schedule for rows that
+    have none yet or were built with a different AVAILABILITY_SLOT_MINUTES.
+
+    Same batching as backfill_player_coordinates(); safe to re-run. Returns
+    the number of rows updated.
+    """
+    conn = get_db_connection()
+    last_id, touched = 0, 0
+    try:
+        while True:
+            rows = conn.execute(
+                '''
+                SELECT id, availability_schedule FROM players
+                WHERE id > ?
+                  AND availability_schedule IS NOT NULL
+                  AND (availability_mask IS NULL
+                       OR availability_slot_minutes IS DISTINCT FROM ?)
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, AVAILABILITY_SLOT_MINUTES, batch_size)).fetchall()
+            if not rows:
+                break
+            ids = [row['id'] for row in rows]
+            bits = [mask_to_bits(player_availability_mask(
+                {'availability_schedule': row['availability_schedule']}))
+                    for row in rows]
+            conn.execute(
+                '''
+                UPDATE players
+                SET availability_mask = CAST(v.bits AS BIT VARYING),
+                    availability_slot_minutes = ?
+                FROM unnest(CAST(? AS INTEGER[]), CAST(? AS TEXT[])) AS v(id, bits)
+                WHERE players.id = v.id
+            ''', (AVAILABILITY_SLOT_MINUTES, ids, bits))
+            conn.commit()
+            touched += len(rows)
+            last_id = ids[-1]
+        if touched:
+            logging.info(f"Backfilled availability masks for {touched} players")
+        return touched
+    except Exception as e:
+        conn.rollback()
+        logging.error(f"Availability mask backfill stopped after id {last_id}: {e}")
+        return touched
+    finally:
+        conn.close()
+
+
 print("DATABASE_URL:", os.environ.get("DATABASE_URL"))
 
 
@@ -3998,14 +4981,9 @@ def inject_user_context():
         )
 
     if current_player_id:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT is_admin FROM players WHERE id = ?',
-                       (current_player_id, ))
-        player = cursor.fetchone()
-        conn.close()
+        player = load_principal(current_player_id)
         if player:
-            is_admin = bool(player['is_admin'])
+            is_admin = player.is_admin
             logging.info(
                 f"Context processor: Player found, is_admin = {is_admin}")
         else:
@@ -4159,15 +5137,13 @@ def player_home(player_id):
     session['current_player_id'] = player_id
     session['player_id'] = player_id  # For consistency
 
-    # Check and handle trial expiry for this user
-    check_and_handle_trial_expiry(player_id)
-
-    # Get player info (refresh after potential trial expiry update)
     cursor.execute('SELECT * FROM players WHERE id = ?', (player_id, ))
     player = cursor.fetchone()
     if not player:
         flash('Player not found', 'danger')
         return redirect(url_for('index'))
+    # Trial expiry is applied in memory; expire_trials() persists it later
+    player = with_trial_downgrade(player)
 
     # ✅ Ensure disclaimers accepted (NDA no longer required)
     if not player['disclaimers_accepted']:
@@ -4263,11 +5239,7 @@ def player_home(player_id):
             'spots_remaining':
             spots_remaining,
             'prize_pool':
-            (     f"1st: ${entry_fee * max_players * 0.7 * 0.5:.0f} • "
-                  f"2nd: ${entry_fee * max_players * 0.7 * 0.3:.0f} • "
-                  f"3rd: ${entry_fee * max_players * 0.7 * 0.12:.0f} • "
-                  f"4th: ${entry_fee * max_players * 0.7 * 0.08:.0f}"
-             )
+            format_prize_pool(entry_fee, max_players)
         })
 
     # --- Get player's tournaments with bracket info ---
@@ -4681,6 +5653,7 @@ def complete_match():
 
     conn.commit()
     conn.close()
+    enqueue_random_matchup('match_completed', *winner_ids, *loser_ids)
 
     return jsonify({
         'success': True,
@@ -4723,20 +5696,14 @@ def register():
             # -------------------------------
             # ZIP → Coordinates (if needed)
             # -------------------------------
+            zip_needs_geocode = False
             if (not location1 or location1.lower() == "unknown") and zip_code:
-                try:
-                    geo_res = requests.get(
-                        f"https://nominatim.openstreetmap.org/search?postalcode={zip_code}&country=US&format=json&limit=1",
-                        headers={"User-Agent": "Ready2DinkApp"})
-                    geo_data = geo_res.json()
-                    if geo_data:
-                        lat = geo_data[0]["lat"]
-                        lon = geo_data[0]["lon"]
-                        location1 = f"{lat},{lon}"
-                    else:
-                        location1 = "Unknown"
-                except:
+                lat, lon = get_coordinates_from_zip_code(zip_code)
+                if lat is not None:
+                    location1 = f"{lat},{lon}"
+                else:
                     location1 = "Unknown"
+                    zip_needs_geocode = True
 
             if not location1:
                 location1 = "Unknown"
@@ -4787,6 +5754,9 @@ def register():
             row = cursor.fetchone()
             numeric_id = row["id"] if row else None
 
+            if zip_needs_geocode and numeric_id:
+                geocode_zip_in_background(numeric_id, zip_code)
+
             # -------------------------------
             # Login user
             # -------------------------------
@@ -4858,6 +5828,7 @@ def accept_disclaimers():
             (player_id, ))
         conn.commit()
         conn.close()
+        forget_principal(player_id)
 
         # Log the user in automatically
         session['current_player_id'] = int(player_id)
@@ -4925,6 +5896,7 @@ def submit_guardian_consent(player_id):
             WHERE id = ?
         ''', (consent_date, player_id))
         conn.commit()
+        player_updated(player_id)
 
         # Get player details for notification
         cursor.execute('SELECT * FROM players WHERE id = ?', (player_id, ))
@@ -5624,6 +6596,7 @@ def sign_nda():
         ''', (signature, client_ip, player_id))
         conn.commit()
         conn.close()
+        forget_principal(player_id)
 
         # Send email notification
         nda_date = datetime.now().strftime('%Y-%m-%d at %I:%M %p UTC')
@@ -5862,16 +6835,8 @@ def tournaments_overview():
 
         custom_tournaments.append(tournament)
 
-    # Load regular tournament levels
+    # Load regular tournament levels (shared and read-only)
     tournament_levels = get_tournament_levels()
-    # ✅ Ensure all levels have a spots_remaining key to prevent template errors
-    for level_name, level_info in tournament_levels.items():
-        if 'spots_remaining' not in level_info:
-            level_info['spots_remaining'] = (
-                level_info.get('max_players', 0) -
-                level_info.get('current_entries', 0)
-                if 'max_players' in level_info
-                and 'current_entries' in level_info else 0)
 
     conn.close()
     return render_template('tournaments_overview.html',
@@ -6243,7 +7208,7 @@ def tournament_entry(player_id):
             'description':
             level_info.get('description', 'Tournament'),
             'prize_pool':
-            f"1st: ${tournament['entry_fee'] * tournament['max_players'] * 0.7 * 0.5:.0f} • 2nd: ${tournament['entry_fee'] * tournament['max_players'] * 0.7 * 0.3:.0f} • 3rd: ${tournament['entry_fee'] * tournament['max_players'] * 0.7 * 0.12:.0f} • 4th: ${tournament['entry_fee'] * tournament['max_players'] * 0.7 * 0.08:.0f}"
+            format_prize_pool(tournament['entry_fee'], tournament['max_players'])
         })
 
     # Get player's connections for partner selection
@@ -6424,7 +7389,7 @@ def complete_tournament(tournament_id):
             if tournament_level in levels:
                 entry_fee = levels[tournament_level]['entry_fee']
                 max_players = levels[tournament_level]['max_players']
-                prizes = levels[tournament_level]['prizes']
+                prizes = levels[tournament_level]['prize_breakdown']
 
                 # Create payout record for 1st place winner
                 first_place_prize = prizes.get('1st', 0)
@@ -6640,24 +7605,18 @@ def update_tournament_level():
     description = request.form.get('description')
 
     # Update tournament settings in database
-    if level == 'Beginner':
-        update_setting('beginner_price', entry_fee)
-        if max_players:
-            update_setting('beginner_max_players', max_players)
-        if description:
-            update_setting('beginner_description', description)
-    elif level == 'Intermediate':
-        update_setting('intermediate_price', entry_fee)
-        if max_players:
-            update_setting('intermediate_max_players', max_players)
-        if description:
-            update_setting('intermediate_description', description)
-    elif level == 'Advanced':
-        update_setting('advanced_price', entry_fee)
+    prefix = {
+        'Beginner': 'beginner',
+        'Intermediate': 'intermediate',
+        'Advanced': 'advanced'
+    }.get(level)
+    if prefix:
+        values = {f'{prefix}_price': entry_fee}
         if max_players:
-            update_setting('advanced_max_players', max_players)
+            values[f'{prefix}_max_players'] = max_players
         if description:
-            update_setting('advanced_description', description)
+            values[f'{prefix}_description'] = description
+        save_settings(values)
 
     flash(
         f'{level} tournament settings updated successfully! Entry fee: ${entry_fee}',
@@ -6674,14 +7633,17 @@ def update_global_settings():
     min_players = request.form.get('min_players')
 
     # Update global tournament settings in database
+    values = {}
     if duration:
-        update_setting('tournament_duration', duration)
+        values['tournament_duration'] = duration
     if deadline:
-        update_setting('registration_deadline', deadline)
+        values['registration_deadline'] = deadline
     if timeout:
-        update_setting('match_timeout', timeout)
+        values['match_timeout'] = timeout
     if min_players:
-        update_setting('min_players', min_players)
+        values['min_players'] = min_players
+    if values:
+        save_settings(values)
 
     flash('Global tournament settings updated successfully!', 'success')
     return redirect(url_for('admin_dashboard'))
@@ -7059,6 +8021,11 @@ def decline_challenge():
 
             conn.commit()
             conn.close()
+            if match:
+                invalidate_compatible_players(match['player1_id'],
+                                              match['player2_id'])
+                enqueue_random_matchup('challenge_declined', match['player1_id'],
+                                       match['player2_id'])
 
             return jsonify({
                 'success':
@@ -7088,66 +8055,12 @@ def random_matchmaking():
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # ----------------------------
-        # Helper functions
-        # ----------------------------
-
-        def parse_location1(value):
-            """Parse 'lat,lon' string into floats."""
-            if not value:
-                return None, None
-            try:
-                lat_str, lon_str = value.split(",")
-                return float(lat_str), float(lon_str)
-            except:
-                return None, None
-
-        def safe_value(row, key):
-            """Safely extract value from sqlite3.Row using indexing only."""
-            return row[key] if key in row.keys() else None
-
-        def extract_coords(row):
-            """
-            Get coordinates from:
-            1. latitude, longitude
-            2. fallback: location1 "lat,lon"
-            """
-            lat = safe_value(row, "latitude")
-            lon = safe_value(row, "longitude")
-
-            # If missing, try fallback
-            if lat is None or lon is None:
-                loc = safe_value(row, "location1")
-                fallback_lat, fallback_lon = parse_location1(loc)
-
-                if lat is None:
-                    lat = fallback_lat
-                if lon is None:
-                    lon = fallback_lon
-
-            # Still invalid?
-            if lat is None or lon is None:
-                return None, None
-
-            return float(lat), float(lon)
-
-        # Haversine distance
-        import math
-
-        def distance(lat1, lon1, lat2, lon2):
-            R = 3958.8
-            dlat = math.radians(lat2 - lat1)
-            dlon = math.radians(lon2 - lon1)
-            a = (math.sin(dlat / 2)**2 + math.cos(math.radians(lat1)) *
-                 math.cos(math.radians(lat2)) * math.sin(dlon / 2)**2)
-            return R * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
-
         # ----------------------------
         # Load user
         # ----------------------------
         cursor.execute(
             """
-            SELECT id, latitude, longitude, location1, search_radius_miles, skill_level
+            SELECT id, latitude, longitude, search_radius_miles, skill_level
             FROM players
             WHERE id = ?
         """, (player_id, ))
@@ -7159,8 +8072,7 @@ def random_matchmaking():
                 "message": "User not found"
             }), 404
 
-        # Extract coords w/ fallback
-        user_lat, user_lon = extract_coords(user)
+        user_lat, user_lon = user["latitude"], user["longitude"]
 
         if user_lat is None or user_lon is None:
             return jsonify({
@@ -7192,25 +8104,28 @@ def random_matchmaking():
 
         cursor.execute(
             f"""
-            SELECT id, full_name, latitude, longitude, location1
+            SELECT id, full_name, latitude, longitude
             FROM players
             WHERE id != ?
               AND skill_level IN ({placeholders})
-        """, (player_id, *allowed_skills))
+              AND geo_cell = ANY(?)
+              AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?
+        """, (player_id, *allowed_skills,
+              cells_within(user_lat, user_lon, radius),
+              *bounding_box(user_lat, user_lon, radius)))
 
         candidates = cursor.fetchall()
 
         # ----------------------------
-        # Filter by radius + fallback coords
+        # Filter by radius
         # ----------------------------
-        nearby = []
-        for p in candidates:
-            opp_lat, opp_lon = extract_coords(p)
-            if opp_lat is None or opp_lon is None:
-                continue
-
-            if distance(user_lat, user_lon, opp_lat, opp_lon) <= radius:
-                nearby.append(p)
+        distances = distances_from(user_lat, user_lon,
+                                   [p["latitude"] for p in candidates],
+                                   [p["longitude"] for p in candidates])
+        nearby = [
+            p for p, dist in zip(candidates, distances)
+            if dist is not None and dist <= radius
+        ]
 
         if not nearby:
             return jsonify({
@@ -7490,28 +8405,12 @@ def browse_players():
     skill_level = request.args.get('skill_level', '')
     distance = request.args.get('distance', '')
 
-    # Get filtered compatible players
-    if match_type or skill_level or distance:
-        compatible_players = get_filtered_compatible_players(
-            current_player_id,
-            match_type=match_type,
-            skill_level=skill_level,
-            distance=int(distance) if distance else None)
-    else:
-        compatible_players = get_compatible_players(current_player_id)
-
-    # Pre-calculate distances for template efficiency (avoid N+1 queries)
-    for player in compatible_players:
-        if isinstance(player, dict):
-            # Add pre-calculated distance to each player
-            player['distance_display'] = get_distance_from_current_player(
-                player, current_player_id)
-        else:
-            # Convert to dict and add distance
-            player_dict = dict(player)
-            player_dict['distance_display'] = get_distance_from_current_player(
-                player_dict, current_player_id)
-            compatible_players[compatible_players.index(player)] = player_dict
+    # First page only; the template fetches the rest from /api/browse-players
+    compatible_players, next_cursor = get_browse_players_page(
+        current_player_id,
+        match_type=match_type,
+        skill_level=skill_level,
+        distance=int(distance) if distance else None)
 
     # Get current player info for display
     conn = get_db_connection()
@@ -7525,10 +8424,43 @@ def browse_players():
 
     return render_template('browse_players.html',
                            players=compatible_players,
+                           next_cursor=next_cursor,
                            current_player=current_player,
                            current_player_id=current_player_id)
 
 
+@app.route('/api/browse-players')
+def api_browse_players():
+    """Next page of browse-players cards for infinite scroll (keyset cursor)"""
+    current_player_id = session.get('current_player_id')
+    if not current_player_id:
+        return jsonify({'success': False, 'error': 'Not logged in'}), 401
+
+    distance = request.args.get('distance', '')
+    try:
+        limit = max(1, min(100, int(request.args.get('limit',
+                                                     BROWSE_PAGE_SIZE))))
+        players, next_cursor = get_browse_players_page(
+            current_player_id,
+            cursor=request.args.get('cursor') or None,
+            limit=limit,
+            match_type=request.args.get('match_type', ''),
+            skill_level=request.args.get('skill_level', ''),
+            distance=int(distance) if distance else None)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor or filter'}), 400
+
+    cards_html = ''.join(
+        render_template('_player_card.html', player=player)
+        for player in players)
+    return jsonify({
+        'success': True,
+        'players': players,
+        'html': cards_html,
+        'next_cursor': next_cursor
+    })
+
+
 @app.route('/profile_settings')
 def profile_settings():
     """Profile settings page - get current logged-in player with team information"""
@@ -7619,17 +8551,20 @@ def update_availability(player_id):
 
         time_preference = request.form.get('time_preference', 'Flexible')
 
-        # Convert to JSON string for database storage
+        # Convert to JSON string for database storage, plus the weekly bitmask
         availability_json = json.dumps(availability_data)
+        availability_bits = mask_to_bits(schedule_to_mask(availability_data))
 
         # Update database
         conn = get_db_connection()
         conn.execute(
             '''
             UPDATE players 
-            SET availability_schedule = ?, time_preference = ? 
+            SET availability_schedule = ?, time_preference = ?,
+                availability_mask = CAST(? AS BIT VARYING), availability_slot_minutes = ?
             WHERE id = ?
-        ''', (availability_json, time_preference, player_id))
+        ''', (availability_json, time_preference, availability_bits,
+              AVAILABILITY_SLOT_MINUTES, player_id))
         conn.commit()
         conn.close()
 
@@ -7767,6 +8702,7 @@ def update_profile():
 
         # --- Determine new location1 ---
         new_location1 = existing_loc
+        zip_needs_geocode = False
         if user_lat and user_lng:
             try:
                 lat = float(user_lat)
@@ -7775,20 +8711,12 @@ def update_profile():
             except ValueError:
                 logging.warning("Invalid GPS coordinates provided")
         elif zip_code != existing_zip:
-            try:
-                geo_res = requests.get(
-                    f"https://nominatim.openstreetmap.org/search?postalcode={zip_code}&country=US&format=json&limit=1",
-                    headers={"User-Agent": "Ready2DinkApp"})
-                geo_data = geo_res.json()
-                if geo_data and len(geo_data) > 0:
-                    lat = geo_data[0]["lat"]
-                    lon = geo_data[0]["lon"]
-                    new_location1 = f"{lat},{lon}"
-                else:
-                    new_location1 = "Unknown"
-            except Exception as e:
-                logging.warning(f"ZIP geocode lookup failed: {e}")
+            lat, lon = get_coordinates_from_zip_code(zip_code)
+            if lat is not None:
+                new_location1 = f"{lat},{lon}"
+            else:
                 new_location1 = "Unknown"
+                zip_needs_geocode = True
 
         # --- Gender + travel radius validation ---
         gender = request.form.get('gender', 'prefer_not_to_say').strip()
@@ -7856,6 +8784,10 @@ def update_profile():
         # --- Commit all at once ---
         conn.commit()
         conn.close()
+        invalidate_compatible_players(player_id)
+
+        if zip_needs_geocode:
+            geocode_zip_in_background(player_id, zip_code)
 
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('index'))
@@ -8074,6 +9006,9 @@ def submit_match_result():
                     conn.commit()
 
         conn.close()
+        enqueue_random_matchup('match_completed', match.get('player1_id'),
+                               match.get('player2_id'), match.get('player3_id'),
+                               match.get('player4_id'))
         return jsonify({"success": True})
 
     except Exception as e:
@@ -8322,12 +9257,9 @@ def admin_required(f):
             flash('Please select your player profile first', 'warning')
             return redirect(url_for('index'))
 
-        conn = get_db_connection()
-        player = conn.execute('SELECT is_admin FROM players WHERE id = ?',
-                              (current_player_id, )).fetchone()
-        conn.close()
+        principal = get_current_principal()
 
-        if not player or not player['is_admin']:
+        if not principal or not principal.is_admin:
             flash('Admin access required', 'danger')
             return redirect(url_for('index'))
 
@@ -9009,15 +9941,20 @@ def reject_match_challenge(challenge_id):
             SET status = 'rejected', responded_at = ?
             WHERE id = ? AND invitee_id = ? AND status = 'pending'
             AND meta_json::jsonb->>'type' = 'singles'
+            RETURNING inviter_id
         ''', (datetime.now(), challenge_id, current_player_id))
+        declined = cursor.fetchone()
 
-        if cursor.rowcount == 0:
+        if not declined:
             flash('Invalid match challenge', 'danger')
         else:
             flash('Match challenge declined', 'info')
 
         conn.commit()
         conn.close()
+        if declined:
+            enqueue_random_matchup('invitation_declined', current_player_id,
+                                   declined['inviter_id'])
         return redirect(request.referrer
                         or url_for('player_home', player_id=current_player_id))
 
@@ -9072,6 +10009,9 @@ def reject_team_invitation_route(invitation_id):
                         ''', (invitation_id, current_player_id))
                         conn.commit()
                         conn.close()
+                        enqueue_random_matchup('invitation_declined',
+                                               current_player_id,
+                                               invitation['inviter_id'])
 
                         flash('Match challenge declined.', 'info')
                         return redirect(url_for('player_home'))
@@ -9146,6 +10086,7 @@ def leave_team():
 
         conn.commit()
         conn.close()
+        invalidate_compatible_players(team['player1_id'], team['player2_id'])
 
         flash(
             'You have successfully switched partners. You can now form a new partnership.',
@@ -9335,6 +10276,7 @@ def admin_players():
         SELECT * FROM players ORDER BY created_at DESC
     ''').fetchall()
     conn.close()
+    players = [with_trial_downgrade(player) for player in players]
 
     return render_template('admin/players.html', players=players)
 
@@ -9432,6 +10374,7 @@ def admin_update_player(player_id):
         conn.execute(f'UPDATE players SET {set_clause} WHERE id = ?', values)
         conn.commit()
         conn.close()
+        player_updated(player_id)
 
         flash(f'Player {request.form["full_name"]} updated successfully!',
               'success')
@@ -9615,6 +10558,7 @@ def toggle_admin(player_id):
                  (new_status, player_id))
     conn.commit()
     conn.close()
+    forget_principal(player_id)
 
     action = "granted" if new_status else "revoked"
     flash(f'Admin access {action} successfully', 'success')
@@ -9786,6 +10730,7 @@ def setup_first_admin():
                  (first_player['id'], ))
     conn.commit()
     conn.close()
+    forget_principal(first_player['id'])
 
     # Set them as current player
     session['current_player_id'] = first_player['id']
@@ -10255,6 +11200,7 @@ def remove_admin_staff(player_id):
         conn.execute('UPDATE players SET is_admin = 0 WHERE id = ?',
                      (player_id, ))
         conn.commit()
+        forget_principal(player_id)
 
         flash(f'Admin access removed from {player["full_name"]}', 'success')
 
@@ -11287,10 +12233,13 @@ def decline_partner_invitation(invitation_id):
 def update_settings():
     """Update system settings"""
     # Get all form data
+    values = {}
     for key in request.form:
         value = request.form[key].strip()
         if value:  # Only update non-empty values
-            update_setting(key, value)
+            values[key] = value
+    if values:
+        save_settings(values)
 
     flash('Settings updated successfully!', 'success')
     return redirect(url_for('admin_settings'))
@@ -11658,6 +12607,7 @@ def membership_payment_page(membership_type):
         ''', (membership_type, session['player_id']))
         conn.commit()
         conn.close()
+        forget_principal(session['player_id'])
 
         membership_display = membership_type.replace("_", " ").title()
         flash(f'Test account granted {membership_display} membership access!',
@@ -11676,6 +12626,7 @@ def membership_payment_page(membership_type):
         ''', (membership_type, session['player_id']))
         conn.commit()
         conn.close()
+        forget_principal(session['player_id'])
 
         membership_display = membership_type.replace("_", " ").title()
         flash(
@@ -11840,6 +12791,7 @@ def subscription_success():
 
         conn.commit()
         conn.close()
+        forget_principal(player_id)
 
         # Track referral conversion if applicable
         track_referral_conversion(player_id, membership_type)
@@ -12265,6 +13217,7 @@ def check_and_grant_ambassador_reward(referrer_id):
 
         conn.commit()
         conn.close()
+        forget_principal(referrer_id)
 
         logging.info(
             f"Granted 12-month membership reward to referrer {referrer_id} for 20 qualified referrals"
@@ -12511,6 +13464,7 @@ def track_referral_conversion(player_id, membership_type):
                     free_tournament_entries = free_tournament_entries + 5
                 WHERE id = ?
             ''', (end_date.isoformat(), referrer_id))
+            forget_principal(referrer_id)
 
             # Mark all referrals as reward granted
             conn.execute(
@@ -77,7 +77,8 @@ CREATE TABLE IF NOT EXISTS players (
     referral_code TEXT,
     phone_number TEXT,
     match_preference TEXT DEFAULT 'singles',
-    current_team_id INTEGER
+    current_team_id INTEGER,
+    geo_cell INTEGER                   -- spatial grid cell, maintained by trg_players_geo_cell
 );
 
 -- settings
@@ -439,6 +440,18 @@ CREATE TABLE IF NOT EXISTS match_reminders (
 CREATE INDEX IF NOT EXISTS idx_match_reminders_composite ON match_reminders(tournament_match_id, player_id, reminder_type);
 CREATE INDEX IF NOT EXISTS idx_match_reminders_status ON match_reminders(delivery_status);
 
+-- geocode_cache (remote geocoder results, including misses, keyed by normalized query)
+CREATE TABLE IF NOT EXISTS geocode_cache (
+    query_key TEXT PRIMARY KEY,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    found INTEGER NOT NULL DEFAULT 1,
+    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_geocode_cache_expires ON geocode_cache(expires_at);
+
 -- indexes referenced in init_db()
 CREATE UNIQUE INDEX IF NOT EXISTS idx_players_referral_code_unique ON players (referral_code) WHERE referral_code IS NOT NULL;
 CREATE UNIQUE INDEX IF NOT EXISTS idx_universal_referrals_pair_unique ON universal_referrals (referrer_player_id, referred_player_id);
@@ -447,6 +460,92 @@ CREATE INDEX IF NOT EXISTS idx_universal_referrals_code ON universal_referrals (
 CREATE INDEX IF NOT EXISTS idx_universal_referrals_qualified ON universal_referrals (qualified);
 CREATE INDEX IF NOT EXISTS idx_universal_referrals_referrer_id ON universal_referrals (referrer_player_id);
 
+-- spatial grid for proximity search (see services/geo_index.py; 0.5 degree cells, 720 columns)
+-- note: init_db() rewrites question marks to %s, so regexes here avoid them
+ALTER TABLE players ADD COLUMN IF NOT EXISTS geo_cell INTEGER;
+
+-- latitude/longitude are the typed source of truth; a 'lat,lon' location1 is copied into them
+-- on insert, when they are empty, or when location1 changes without them being set explicitly
+CREATE OR REPLACE FUNCTION players_set_geo_cell() RETURNS trigger AS $$
+DECLARE
+    lat DOUBLE PRECISION;
+    lon DOUBLE PRECISION;
+BEGIN
+    IF NEW.location1 ~ '^\s*-{0,1}[0-9]+(\.[0-9]+){0,1}\s*,\s*-{0,1}[0-9]+(\.[0-9]+){0,1}\s*$'
+       AND (NEW.latitude IS NULL OR NEW.longitude IS NULL
+            OR (TG_OP = 'UPDATE'
+                AND NEW.location1 IS DISTINCT FROM OLD.location1
+                AND NEW.latitude IS NOT DISTINCT FROM OLD.latitude
+                AND NEW.longitude IS NOT DISTINCT FROM OLD.longitude)) THEN
+        lat := split_part(NEW.location1, ',', 1)::DOUBLE PRECISION;
+        lon := split_part(NEW.location1, ',', 2)::DOUBLE PRECISION;
+        IF lat BETWEEN -90 AND 90 AND lon BETWEEN -180 AND 180 THEN
+            NEW.latitude := lat;
+            NEW.longitude := lon;
+        END IF;
+    END IF;
+
+    IF NEW.latitude BETWEEN -90 AND 90 AND NEW.longitude BETWEEN -180 AND 180 THEN
+        NEW.geo_cell := LEAST(359, floor((NEW.latitude + 90) / 0.5)::INTEGER) * 720
+                      + LEAST(719, floor((NEW.longitude + 180) / 0.5)::INTEGER);
+    ELSE
+        NEW.geo_cell := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_players_geo_cell ON players;
+CREATE TRIGGER trg_players_geo_cell
+    BEFORE INSERT OR UPDATE OF latitude, longitude, location1 ON players
+    FOR EACH ROW EXECUTE FUNCTION players_set_geo_cell();
+
+CREATE INDEX IF NOT EXISTS idx_players_geo_cell ON players (geo_cell);
+
+-- radius searches: bounding-box range scan within a skill level, and the looking-for-match filter
+CREATE INDEX IF NOT EXISTS idx_players_skill_lat_lon ON players (skill_level, latitude, longitude);
+CREATE INDEX IF NOT EXISTS idx_players_looking_skill ON players (is_looking_for_match, skill_level);
+
+-- text -> timestamp that yields NULL instead of raising on malformed input
+-- (used by expire_trials() on the free-form trial_end_date column)
+CREATE OR REPLACE FUNCTION safe_timestamp(value TEXT) RETURNS TIMESTAMP AS $$
+BEGIN
+    RETURN value::timestamp;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- background job leases (RandomMatchupEngine leader election; heartbeat_at older than the lease = expired)
+CREATE TABLE IF NOT EXISTS system_jobs (
+    job_name TEXT PRIMARY KEY,
+    last_run_at TIMESTAMP,
+    owner_pid TEXT,
+    heartbeat_at TIMESTAMP
+);
+
+-- players waiting for the incremental random matchup worker (one row per player)
+CREATE TABLE IF NOT EXISTS matchup_queue (
+    player_id INTEGER PRIMARY KEY REFERENCES players(id) ON DELETE CASCADE,
+    reason TEXT,
+    enqueued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_matchup_queue_enqueued ON matchup_queue (enqueued_at);
+-- last pass that could not pair the player; retried after RANDOM_MATCHUP_QUEUE_RETRY_SECONDS
+ALTER TABLE matchup_queue ADD COLUMN IF NOT EXISTS attempted_at TIMESTAMP;
+
+-- weekly availability bitmask (services/availability.py): bit day * slots_per_day + slot,
+-- built from availability_schedule with availability_slot_minutes-sized slots
+ALTER TABLE players ADD COLUMN IF NOT EXISTS availability_mask BIT VARYING(2016);
+ALTER TABLE players ADD COLUMN IF NOT EXISTS availability_slot_minutes INTEGER;
+
+-- random matchup eligibility: NOT EXISTS probes for pending invitations either way
+CREATE INDEX IF NOT EXISTS idx_team_invitations_status_inviter ON team_invitations (status, inviter_id);
+CREATE INDEX IF NOT EXISTS idx_team_invitations_status_invitee ON team_invitations (status, invitee_id);
+
+-- rows written before the trigger existed are backfilled in batches by
+-- backfill_player_coordinates() in app.py, which init_db() runs after this file
+
 -- seed default settings (idempotent)
 INSERT INTO settings (key, value, description)
 VALUES
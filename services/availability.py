@@ -0,0 +1,149 @@
+"""
+Weekly availability bitmasks
+
+A player's weekly availability (players.availability_schedule JSON, as
+written by update_availability) is also stored as one bitmask: bit
+day * SLOTS_PER_DAY + slot is set when the player is free in that slot,
+Monday first. Two players' common free time is then a single AND, and
+candidate lists can be ranked by bit_count(a & b) in SQL.
+
+The slot size is AVAILABILITY_SLOT_MINUTES (default 60, must divide a
+day). Masks are stored as BIT VARYING in players.availability_mask next to
+availability_slot_minutes; rows built with a different slot size are
+rebuilt by backfill_availability_masks() in app.py.
+
+Time slot labels may be clock times ("6 PM", "18:00"), ranges
+("6:00 PM - 8:00 PM", "18:00-20:00") or periods ("morning", "afternoon",
+"evening", "night"). A day marked available with no readable slots counts
+as free all day.
+"""
+
+import logging
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday',
+        'sunday')
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _slot_minutes_from_env() -> int:
+    minutes = int(os.environ.get('AVAILABILITY_SLOT_MINUTES', 60))
+    if minutes < 5 or MINUTES_PER_DAY % minutes:
+        logger.warning(
+            f"AVAILABILITY_SLOT_MINUTES={minutes} does not divide a day into "
+            f"slots of at least 5 minutes; using 60")
+        return 60
+    return minutes
+
+
+SLOT_MINUTES = _slot_minutes_from_env()
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+WEEK_BITS = 7 * SLOTS_PER_DAY
+
+# Minutes after midnight
+PERIODS = {
+    'early morning': (5 * 60, 8 * 60),
+    'morning': (6 * 60, 12 * 60),
+    'midday': (11 * 60, 14 * 60),
+    'lunch': (11 * 60, 14 * 60),
+    'afternoon': (12 * 60, 17 * 60),
+    'evening': (17 * 60, 21 * 60),
+    'night': (21 * 60, 24 * 60),
+    'all day': (0, MINUTES_PER_DAY),
+}
+
+_CLOCK = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*(?:([ap])\.?m\.?)?', re.IGNORECASE)
+
+
+def _parse_clock(text: str) -> Optional[int]:
+    match = _CLOCK.fullmatch(text.strip())
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == 'p' else 0)
+    if hour > 24 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def parse_time_slot(label) -> Optional[Tuple[int, int]]:
+    """(start, end) minutes after midnight for a slot label, or None if unreadable"""
+    text = str(label or '').strip().lower()
+    if not text:
+        return None
+    for name, span in PERIODS.items():
+        if text == name or text.startswith(name + ' '):
+            return span
+    parts = re.split(r'\s*(?:-|–|to)\s*', text, maxsplit=1)
+    start = _parse_clock(parts[0])
+    if start is None:
+        return None
+    if len(parts) == 2:
+        end = _parse_clock(parts[1])
+        if end is None:
+            return None
+        if end <= start:
+            end = MINUTES_PER_DAY
+    else:
+        end = start + max(SLOT_MINUTES, 60)  # a bare time means "starting then"
+    return start, min(end, MINUTES_PER_DAY)
+
+
+def schedule_to_mask(schedule: Optional[Dict]) -> int:
+    """Bitmask for an availability_schedule dict; 0 when no day is available"""
+    mask = 0
+    day_bits = (1 << SLOTS_PER_DAY) - 1
+    for day_index, day in enumerate(DAYS):
+        entry = (schedule or {}).get(day) or {}
+        if not entry.get('available'):
+            continue
+        day_mask = 0
+        for label in entry.get('time_slots') or []:
+            span = parse_time_slot(label)
+            if span is None:
+                continue
+            first = span[0] // SLOT_MINUTES
+            last = -(-span[1] // SLOT_MINUTES)  # slots touched by the span
+            day_mask |= ((1 << (last - first)) - 1) << first
+        mask |= (day_mask or day_bits) << (day_index * SLOTS_PER_DAY)
+    return mask
+
+
+def mask_to_bits(mask: int) -> str:
+    """BIT VARYING literal for a mask; character i is slot i"""
+    return format(mask, f'0{WEEK_BITS}b')[::-1]
+
+
+def bits_to_mask(bits) -> Optional[int]:
+    """Mask from a stored BIT VARYING value, or None if missing or built with another slot size"""
+    if bits is None or len(bits) != WEEK_BITS:
+        return None
+    return int(str(bits)[::-1], 2)
+
+
+def overlap_slots(mask_a: int, mask_b: int) -> int:
+    """Number of weekly slots both masks have free"""
+    return (mask_a & mask_b).bit_count()
+
+
+def describe_slot(slot: int) -> str:
+    """'Monday 6:00 PM' for a weekly slot index"""
+    day, minutes = divmod(slot, SLOTS_PER_DAY)
+    minutes *= SLOT_MINUTES
+    hour, minute = divmod(minutes, 60)
+    return f"{DAYS[day].title()} {hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def first_slot(mask: int) -> Optional[str]:
+    """Description of the earliest free slot in the week, or None for an empty mask"""
+    if not mask:
+        return None
+    return describe_slot((mask & -mask).bit_length() - 1)
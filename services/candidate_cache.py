@@ -0,0 +1,212 @@
+"""
+Per-player cache of compatible-player result sets
+
+get_compatible_players() stores the ordered candidate ids and distances it
+found for a searcher, tagged with the searcher's matching state (skill,
+coordinates, radius). A later call with the same state skips the spatial
+scan and only re-reads the candidate rows by primary key.
+
+Entries are dropped when:
+- the searcher's state no longer matches (checked on read),
+- invalidate(player_id) is called for the searcher or for any candidate
+  in the cached result set (profile, location, skill or looking-for-match
+  changes),
+- the TTL expires, which bounds how long a newly eligible player can be
+  missing from someone's list.
+
+Storage is pluggable. RedisBackend shares entries across workers and is
+used whenever COMPAT_CACHE_REDIS_URL (or REDIS_URL) is set; it needs the
+optional redis package (pip install ".[redis]"). LocalLRUBackend is the
+fallback and is single-process only: an invalidation reaches just the
+worker that made the write, so with several gunicorn workers the others
+serve their copy until the TTL expires. Any object with get/set/delete plus
+the set operations link/members works as a backend, which is how tests and
+local runs swap in a stand-in. The reverse links (candidate -> searchers)
+are sets updated atomically by the backend (SADD / SMEMBERS on Redis), so
+concurrent puts never drop each other's searchers.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Entry = Tuple[int, Optional[float]]
+
+
+class LocalLRUBackend:
+    """
+    In-process LRU with per-key expiry.
+
+    Link sets live outside the LRU, so evicting entries never loses the
+    reverse links of entries still cached; each member expires with the
+    entry that added it.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._links = {}  # key -> {member: expires_at}
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._links.pop(key, None)
+
+    def link(self, keys: Iterable[str], member, ttl: float):
+        """Add member to the set stored at each key"""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._links.setdefault(key, {})[member] = now + ttl
+            # Expired members are swept at most once a minute
+            if now - self._pruned_at >= 60:
+                self._prune_links(now)
+
+    def _prune_links(self, now: float):
+        self._pruned_at = now
+        for key in list(self._links):
+            live = {m: exp for m, exp in self._links[key].items() if exp > now}
+            if live:
+                self._links[key] = live
+            else:
+                del self._links[key]
+
+    def members(self, keys: Iterable[str]) -> set:
+        """Union of the unexpired members of the sets stored at keys"""
+        now = time.monotonic()
+        with self._lock:
+            return {member for key in keys
+                    for member, expires_at in self._links.get(key, {}).items()
+                    if expires_at > now}
+
+
+class RedisBackend:
+    """Shared backend; values are stored as JSON"""
+
+    def __init__(self, url: str):
+        import redis  # optional extra: pip install ".[redis]"
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Any:
+        raw = self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._client.set(key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, *keys: str):
+        if keys:
+            self._client.delete(*keys)
+
+    def link(self, keys: Iterable[str], member, ttl: float):
+        """SADD member to every key (refreshing its expiry) in one round trip"""
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.sadd(key, member)
+            pipe.expire(key, max(1, int(ttl)))
+        pipe.execute()
+
+    def members(self, keys: Iterable[str]) -> set:
+        """Union of the sets at keys (SMEMBERS in one round trip), as ints"""
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.smembers(key)
+        return {int(member) for result in pipe.execute() for member in result}
+
+
+class CompatiblePlayerCache:
+    """Searcher -> [(candidate_id, distance_miles)], with reverse links for invalidation"""
+
+    def __init__(self, backend, ttl: float = 300):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(player_id) -> str:
+        return f"compat:{player_id}"
+
+    @staticmethod
+    def _reverse_key(player_id) -> str:
+        return f"compat-in:{player_id}"
+
+    def get(self, player_id, state: Iterable) -> Optional[List[Entry]]:
+        """Cached entries for player_id, or None if missing or cached for a different state"""
+        try:
+            cached = self.backend.get(self._key(player_id))
+        except Exception as e:
+            logger.warning(f"Compatible-player cache read failed: {e}")
+            return None
+        if not cached or cached.get('state') != list(state):
+            return None
+        return [(cid, dist) for cid, dist in cached['entries']]
+
+    def put(self, player_id, state: Iterable, entries: List[Entry]):
+        try:
+            self.backend.set(self._key(player_id), {
+                'state': list(state),
+                'entries': [[cid, dist] for cid, dist in entries],
+            }, self.ttl)
+            # Let each candidate find the searchers whose lists include them
+            self.backend.link([self._reverse_key(cid) for cid, _ in entries],
+                              player_id, self.ttl)
+        except Exception as e:
+            logger.warning(f"Compatible-player cache write failed: {e}")
+
+    def invalidate(self, *player_ids):
+        """Drop the cached lists of these players and of every searcher whose list contains them"""
+        try:
+            reverse_keys = [self._reverse_key(pid) for pid in player_ids]
+            searchers = self.backend.members(reverse_keys)
+            self.backend.delete(*[self._key(pid) for pid in player_ids],
+                                *[self._key(searcher) for searcher in searchers],
+                                *reverse_keys)
+        except Exception as e:
+            logger.warning(f"Compatible-player cache invalidation failed: {e}")
+
+
+def backend_from_env():
+    """
+    Pick the cache backend from COMPAT_CACHE_BACKEND (local or redis).
+
+    Defaults to redis when COMPAT_CACHE_REDIS_URL or REDIS_URL is set, so
+    every worker sees every invalidation; otherwise the per-process LRU.
+    """
+    url = os.environ.get('COMPAT_CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    kind = os.environ.get('COMPAT_CACHE_BACKEND', 'redis' if url else 'local')
+    if kind == 'redis':
+        try:
+            if url:
+                return RedisBackend(url)
+        except ImportError:
+            pass
+        logger.warning(
+            "COMPAT_CACHE_BACKEND=redis needs the redis package (the redis extra) "
+            "and COMPAT_CACHE_REDIS_URL or REDIS_URL; using the in-process cache")
+    return LocalLRUBackend(int(os.environ.get('COMPAT_CACHE_SIZE', 10000)))
@@ -0,0 +1,287 @@
+"""
+City-name coordinate index for location-text fallbacks
+
+estimate_coordinates_from_location() uses this when a player has no GPS
+coordinates, only free text such as "Columbus, GA" or "brooklyn". The
+index is built once at import; lookups are a normalization step plus two
+dict probes.
+
+City names that exist in several states are keyed by (city, state). A bare
+city name resolves to the first entry listed for it in CITY_COORDINATES,
+so list the larger / more likely city first.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Coordinates = Tuple[Optional[float], Optional[float]]
+
+# (city, state, lat, lon)
+CITY_COORDINATES = [
+    # New York Area
+    ('manhattan', 'NY', 40.7831, -73.9712),
+    ('brooklyn', 'NY', 40.6782, -73.9442),
+    ('queens', 'NY', 40.7282, -73.7949),
+    ('bronx', 'NY', 40.8448, -73.8648),
+    ('new york', 'NY', 40.7589, -73.9851),
+    ('nyc', 'NY', 40.7589, -73.9851),
+
+    # Major US Cities
+    ('los angeles', 'CA', 34.0522, -118.2437),
+    ('chicago', 'IL', 41.8781, -87.6298),
+    ('houston', 'TX', 29.7604, -95.3698),
+    ('phoenix', 'AZ', 33.4484, -112.0740),
+    ('philadelphia', 'PA', 39.9526, -75.1652),
+    ('san antonio', 'TX', 29.4241, -98.4936),
+    ('san diego', 'CA', 32.7157, -117.1611),
+    ('dallas', 'TX', 32.7767, -96.7970),
+    ('san jose', 'CA', 37.3382, -121.8863),
+    ('austin', 'TX', 30.2672, -97.7431),
+    ('jacksonville', 'FL', 30.3322, -81.6557),
+    ('fort worth', 'TX', 32.7555, -97.3308),
+    ('columbus', 'OH', 39.9612, -82.9988),
+    ('san francisco', 'CA', 37.7749, -122.4194),
+    ('charlotte', 'NC', 35.2271, -80.8431),
+    ('indianapolis', 'IN', 39.7684, -86.1581),
+    ('seattle', 'WA', 47.6062, -122.3321),
+    ('denver', 'CO', 39.7392, -104.9903),
+    ('boston', 'MA', 42.3601, -71.0589),
+    ('el paso', 'TX', 31.7619, -106.4850),
+    ('detroit', 'MI', 42.3314, -83.0458),
+    ('nashville', 'TN', 36.1627, -86.7816),
+    ('portland', 'OR', 45.5152, -122.6784),
+    ('oklahoma city', 'OK', 35.4676, -97.5164),
+    ('las vegas', 'NV', 36.1699, -115.1398),
+    ('louisville', 'KY', 38.2527, -85.7585),
+    ('baltimore', 'MD', 39.2904, -76.6122),
+    ('milwaukee', 'WI', 43.0389, -87.9065),
+    ('albuquerque', 'NM', 35.0844, -106.6504),
+    ('tucson', 'AZ', 32.2226, -110.9747),
+    ('fresno', 'CA', 36.7378, -119.7871),
+    ('sacramento', 'CA', 38.5816, -121.4944),
+    ('kansas city', 'MO', 39.0997, -94.5786),
+    ('mesa', 'AZ', 33.4152, -111.8315),
+    ('atlanta', 'GA', 33.7490, -84.3880),
+    ('omaha', 'NE', 41.2565, -95.9345),
+    ('colorado springs', 'CO', 38.8339, -104.8214),
+    ('raleigh', 'NC', 35.7796, -78.6382),
+    ('miami', 'FL', 25.7617, -80.1918),
+    ('cleveland', 'OH', 41.4993, -81.6944),
+    ('tulsa', 'OK', 36.1540, -95.9928),
+    ('oakland', 'CA', 37.8044, -122.2711),
+    ('minneapolis', 'MN', 44.9778, -93.2650),
+    ('wichita', 'KS', 37.6872, -97.3301),
+    ('arlington', 'TX', 32.7357, -97.1081),
+    ('new orleans', 'LA', 29.9511, -90.0715),
+    ('bakersfield', 'CA', 35.3733, -119.0187),
+    ('tampa', 'FL', 27.9506, -82.4572),
+    ('honolulu', 'HI', 21.3099, -157.8581),
+    ('anaheim', 'CA', 33.8366, -117.9143),
+    ('aurora', 'CO', 39.7294, -104.8319),
+    ('santa ana', 'CA', 33.7455, -117.8677),
+    ('st. louis', 'MO', 38.6270, -90.1994),
+    ('riverside', 'CA', 33.9533, -117.3962),
+    ('corpus christi', 'TX', 27.8006, -97.3964),
+    ('lexington', 'KY', 38.0406, -84.5037),
+    ('pittsburgh', 'PA', 40.4406, -79.9959),
+    ('anchorage', 'AK', 61.2181, -149.9003),
+    ('stockton', 'CA', 37.9577, -121.2908),
+    ('cincinnati', 'OH', 39.1031, -84.5120),
+    ('st. paul', 'MN', 44.9537, -93.0900),
+    ('toledo', 'OH', 41.6528, -83.5379),
+    ('newark', 'NJ', 40.7357, -74.1724),
+    ('greensboro', 'NC', 36.0726, -79.7920),
+    ('plano', 'TX', 33.0198, -96.6989),
+    ('henderson', 'NV', 36.0395, -114.9817),
+    ('lincoln', 'NE', 40.8136, -96.7026),
+    ('buffalo', 'NY', 42.8864, -78.8784),
+    ('jersey city', 'NJ', 40.7178, -74.0431),
+    ('chula vista', 'CA', 32.6401, -117.0842),
+    ('fort wayne', 'IN', 41.0793, -85.1394),
+    ('orlando', 'FL', 28.5383, -81.3792),
+    ('st. petersburg', 'FL', 27.7676, -82.6403),
+    ('chandler', 'AZ', 33.3062, -111.8413),
+    ('laredo', 'TX', 27.5306, -99.4803),
+    ('norfolk', 'VA', 36.8468, -76.2852),
+    ('durham', 'NC', 35.9940, -78.8986),
+    ('madison', 'WI', 43.0731, -89.4012),
+    ('lubbock', 'TX', 33.5779, -101.8552),
+    ('irvine', 'CA', 33.6846, -117.8265),
+    ('winston-salem', 'NC', 36.0999, -80.2442),
+    ('glendale', 'AZ', 33.5387, -112.1860),
+    ('garland', 'TX', 32.9126, -96.6389),
+    ('hialeah', 'FL', 25.8576, -80.2781),
+    ('reno', 'NV', 39.5296, -119.8138),
+    ('chesapeake', 'VA', 36.7682, -76.2875),
+    ('gilbert', 'AZ', 33.3528, -111.7890),
+    ('baton rouge', 'LA', 30.4515, -91.1871),
+    ('irving', 'TX', 32.8140, -96.9489),
+    ('scottsdale', 'AZ', 33.4942, -111.9261),
+    ('north las vegas', 'NV', 36.1989, -115.1175),
+    ('fremont', 'CA', 37.5485, -121.9886),
+    ('boise', 'ID', 43.6150, -116.2023),
+    ('richmond', 'VA', 37.5407, -77.4360),
+    ('san bernardino', 'CA', 34.1083, -117.2898),
+    ('birmingham', 'AL', 33.5186, -86.8104),
+    ('spokane', 'WA', 47.6587, -117.4260),
+    ('rochester', 'NY', 43.1566, -77.6088),
+    ('des moines', 'IA', 41.5868, -93.6250),
+    ('modesto', 'CA', 37.6391, -120.9969),
+    ('fayetteville', 'AR', 36.0726, -94.1574),
+    ('tacoma', 'WA', 47.2529, -122.4443),
+    ('oxnard', 'CA', 34.1975, -119.1771),
+    ('fontana', 'CA', 34.0922, -117.4350),
+    ('columbus', 'GA', 32.4609, -84.9877),
+    ('montgomery', 'AL', 32.3617, -86.2792),
+    ('moreno valley', 'CA', 33.9425, -117.2297),
+    ('shreveport', 'LA', 32.5252, -93.7502),
+    ('aurora', 'IL', 41.7606, -88.3201),
+    ('yonkers', 'NY', 40.9312, -73.8988),
+    ('akron', 'OH', 41.0814, -81.5190),
+    ('huntington beach', 'CA', 33.6595, -117.9988),
+    ('little rock', 'AR', 34.7465, -92.2896),
+    ('augusta', 'GA', 33.4735, -82.0105),
+    ('amarillo', 'TX', 35.2220, -101.8313),
+    ('glendale', 'CA', 34.1425, -118.2551),
+    ('mobile', 'AL', 30.6954, -88.0399),
+    ('grand rapids', 'MI', 42.9634, -85.6681),
+    ('salt lake city', 'UT', 40.7608, -111.8910),
+    ('tallahassee', 'FL', 30.4518, -84.2807),
+    ('huntsville', 'AL', 34.7304, -86.5861),
+    ('grand prairie', 'TX', 32.7460, -96.9978),
+    ('knoxville', 'TN', 35.9606, -83.9207),
+    ('worcester', 'MA', 42.2626, -71.8023),
+    ('newport news', 'VA', 37.0871, -76.4730),
+    ('brownsville', 'TX', 25.9018, -97.4975),
+    ('overland park', 'KS', 38.9822, -94.6708),
+    ('santa clarita', 'CA', 34.3917, -118.5426),
+    ('providence', 'RI', 41.8240, -71.4128),
+    ('garden grove', 'CA', 33.7739, -117.9414),
+    ('chattanooga', 'TN', 35.0456, -85.3097),
+    ('oceanside', 'CA', 33.1959, -117.3795),
+    ('jackson', 'MS', 32.2988, -90.1848),
+    ('fort lauderdale', 'FL', 26.1224, -80.1373),
+    ('santa rosa', 'CA', 38.4404, -122.7144),
+    ('rancho cucamonga', 'CA', 34.1064, -117.5931),
+    ('port st. lucie', 'FL', 27.2939, -80.3501),
+    ('tempe', 'AZ', 33.4255, -111.9400),
+    ('ontario', 'CA', 34.0633, -117.6509),
+    ('vancouver', 'WA', 45.6387, -122.6615),
+    ('cape coral', 'FL', 26.5629, -81.9495),
+    ('sioux falls', 'SD', 43.5446, -96.7311),
+    ('springfield', 'MO', 37.2153, -93.2982),
+    ('springfield', 'IL', 39.7817, -89.6501),
+    ('peoria', 'IL', 40.6936, -89.5890),
+    ('pembroke pines', 'FL', 26.0073, -80.2962),
+    ('elk grove', 'CA', 38.4088, -121.3716),
+    ('corona', 'CA', 33.8753, -117.5664),
+    ('lancaster', 'CA', 34.6868, -118.1542),
+    ('eugene', 'OR', 44.0521, -123.0868),
+    ('palmdale', 'CA', 34.5794, -118.1165),
+    ('salinas', 'CA', 36.6777, -121.6555),
+    ('pasadena', 'CA', 34.1478, -118.1445),
+    ('fort collins', 'CO', 40.5853, -105.0844),
+    ('hayward', 'CA', 37.6688, -122.0808),
+    ('pomona', 'CA', 34.0555, -117.7500),
+    ('cary', 'NC', 35.7915, -78.7811),
+    ('rockford', 'IL', 42.2711, -89.0940),
+    ('alexandria', 'VA', 38.8048, -77.0469),
+    ('escondido', 'CA', 33.1192, -117.0864),
+    ('mckinney', 'TX', 33.1972, -96.6397),
+    ('kansas city', 'KS', 39.1142, -94.6275),
+    ('joliet', 'IL', 41.5250, -88.0817),
+    ('sunnyvale', 'CA', 37.3688, -122.0363),
+]
+
+STATE_ABBREVIATIONS = {
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR',
+    'california': 'CA', 'colorado': 'CO', 'connecticut': 'CT',
+    'delaware': 'DE', 'district of columbia': 'DC', 'florida': 'FL',
+    'georgia': 'GA', 'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL',
+    'indiana': 'IN', 'iowa': 'IA', 'kansas': 'KS', 'kentucky': 'KY',
+    'louisiana': 'LA', 'maine': 'ME', 'maryland': 'MD',
+    'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN',
+    'mississippi': 'MS', 'missouri': 'MO', 'montana': 'MT',
+    'nebraska': 'NE', 'nevada': 'NV', 'new hampshire': 'NH',
+    'new jersey': 'NJ', 'new mexico': 'NM', 'new york': 'NY',
+    'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH',
+    'oklahoma': 'OK', 'oregon': 'OR', 'pennsylvania': 'PA',
+    'rhode island': 'RI', 'south carolina': 'SC', 'south dakota': 'SD',
+    'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT',
+    'virginia': 'VA', 'washington': 'WA', 'west virginia': 'WV',
+    'wisconsin': 'WI', 'wyoming': 'WY',
+}
+_STATE_CODES = frozenset(STATE_ABBREVIATIONS.values())
+_COUNTRY_SUFFIXES = frozenset({'usa', 'us', 'u.s.', 'u.s.a.', 'united states'})
+
+_SAINT_PREFIX = re.compile(r'^(saint|st)\.?\s+')
+_ZIP_SUFFIX = re.compile(r'\s*\d{5}(-\d{4})?$')
+
+
+def normalize_city(city: str) -> str:
+    """Lower-case, collapse whitespace and spell "Saint"/"St" as "st." """
+    city = ' '.join(city.lower().split())
+    return _SAINT_PREFIX.sub('st. ', city).replace(' saint ', ' st. ')
+
+
+def normalize_state(state: str) -> Optional[str]:
+    """Return the two-letter code for a state name or code, or None"""
+    state = _ZIP_SUFFIX.sub('', ' '.join(state.lower().split())).rstrip('.')
+    if state.upper() in _STATE_CODES:
+        return state.upper()
+    return STATE_ABBREVIATIONS.get(state)
+
+
+def _build_index(rows):
+    by_city_state: Dict[Tuple[str, str], Tuple[float, float]] = {}
+    by_city: Dict[str, Tuple[float, float]] = {}
+    for city, state, lat, lon in rows:
+        key = normalize_city(city)
+        by_city_state[(key, state)] = (lat, lon)
+        by_city.setdefault(key, (lat, lon))  # first listed wins
+    return by_city_state, by_city
+
+
+_BY_CITY_STATE, _BY_CITY = _build_index(CITY_COORDINATES)
+
+
+def _split_location(text: str) -> Tuple[str, Optional[str]]:
+    """Split "City, State[, USA]" into (normalized city, state code or None)"""
+    parts = [p.strip() for p in text.split(',') if p.strip()]
+    if len(parts) > 1 and parts[-1].lower() in _COUNTRY_SUFFIXES:
+        parts.pop()
+    if not parts:
+        return '', None
+    state = normalize_state(parts[1]) if len(parts) > 1 else None
+    return normalize_city(parts[0]), state
+
+
+@lru_cache(maxsize=4096)
+def lookup_city(location_text: str) -> Coordinates:
+    """
+    Estimate (lat, lon) for "City", "City, ST" or "City, State" text.
+
+    A known state picks the matching city; an unknown or missing state
+    falls back to the default city of that name. Returns (None, None)
+    when nothing matches.
+    """
+    if not location_text:
+        return None, None
+    city, state = _split_location(str(location_text))
+    if state:
+        coords = _BY_CITY_STATE.get((city, state))
+        if coords:
+            return coords
+    return _BY_CITY.get(city, (None, None))
+
+
+def lookup_cities(location_texts: Iterable[str]) -> List[Coordinates]:
+    """Resolve many location strings at once; the result lines up with the input"""
+    resolved: Dict[str, Coordinates] = {}
+    results = []
+    for text in location_texts:
+        if text not in resolved:
+            resolved[text] = lookup_city(text) if text else (None, None)
+        results.append(resolved[text])
+    return results
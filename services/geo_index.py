@@ -0,0 +1,70 @@
+"""
+Spatial grid index for player proximity search
+
+Players are bucketed into fixed lat/lon grid cells (players.geo_cell, kept
+in sync by the trg_players_geo_cell trigger in schema.sql). A radius query
+first narrows candidates to the handful of cells overlapping the search
+circle's bounding box, then callers refine with an exact haversine.
+
+GEO_CELL_DEGREES must match the constant used by players_set_geo_cell()
+in schema.sql; changing it requires re-running the backfill there.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+GEO_CELL_DEGREES = 0.5
+GRID_ROWS = int(round(180 / GEO_CELL_DEGREES))
+GRID_COLS = int(round(360 / GEO_CELL_DEGREES))
+
+MILES_PER_DEGREE_LAT = 69.0
+
+
+def geo_cell_for(lat, lon) -> Optional[int]:
+    """Return the grid cell id containing (lat, lon), or None for invalid coordinates"""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        return None
+    row = min(GRID_ROWS - 1, int(math.floor((lat + 90) / GEO_CELL_DEGREES)))
+    col = min(GRID_COLS - 1, int(math.floor((lon + 180) / GEO_CELL_DEGREES)))
+    return row * GRID_COLS + col
+
+
+def bounding_box(lat: float, lon: float,
+                 radius_miles: float) -> Tuple[float, float, float, float]:
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) enclosing a circle of radius_miles.
+
+    Longitude bounds are not wrapped; a box crossing the antimeridian or
+    reaching a pole widens to the full longitude range.
+    """
+    lat, lon = float(lat), float(lon)
+    dlat = radius_miles / MILES_PER_DEGREE_LAT
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+
+    # Use the widest parallel inside the box so the circle stays covered
+    widest = max(abs(min_lat), abs(max_lat))
+    cos_lat = math.cos(math.radians(widest))
+    if cos_lat < 1e-6:
+        return min_lat, max_lat, -180.0, 180.0
+    dlon = radius_miles / (MILES_PER_DEGREE_LAT * cos_lat)
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180 or max_lon > 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def cells_within(lat, lon, radius_miles) -> List[int]:
+    """Return every grid cell overlapping the bounding box of a radius search"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_miles)
+    row_lo = int(math.floor((min_lat + 90) / GEO_CELL_DEGREES))
+    row_hi = min(GRID_ROWS - 1, int(math.floor((max_lat + 90) / GEO_CELL_DEGREES)))
+    col_lo = int(math.floor((min_lon + 180) / GEO_CELL_DEGREES))
+    col_hi = min(GRID_COLS - 1, int(math.floor((max_lon + 180) / GEO_CELL_DEGREES)))
+    return [
+        row * GRID_COLS + col for row in range(row_lo, row_hi + 1)
+        for col in range(col_lo, col_hi + 1)
+    ]
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Dry-run benchmark for the Random Matchup Engine
+
+Loads a synthetic or snapshot player set into a scratch schema of a local
+Postgres database, then runs the engine end to end - the eligibility query,
+create_singles_matchups() and create_doubles_matchups() - without sending
+any invitations. For each size it reports pairs formed, pairing quality
+(skill gap and distance), statements and connections issued, and wall time:
+
+    python -m services.random_matchup_engine bench --database-url postgresql://localhost/r2d_bench
+    python -m services.random_matchup_engine bench --database-url ... --snapshot backup.sql --sizes 1000 10000 100000
+
+Everything lives in the matchup_bench schema, which is dropped afterwards
+unless --keep is given, so the target database's own tables are never
+touched. With --snapshot, players from the pg_dump file's players table
+are resampled with jittered coordinates up to each size; otherwise players
+are spread around a handful of US metros. The engine's RANDOM_MATCHUP_*
+settings apply as usual.
+"""
+
+import argparse
+import io
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from services import random_matchup_engine
+from services.distance import haversine_miles
+from services.geo_index import geo_cell_for
+from services.pairing import skill_gap
+
+SCHEMA = 'matchup_bench'
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+SKILLS = ('Beginner', 'Intermediate', 'Advanced')
+SKILL_WEIGHTS = (4, 4, 2)
+
+# (lat, lon, relative population)
+METROS = [
+    (40.71, -74.01, 10), (34.05, -118.24, 8), (41.88, -87.63, 6),
+    (29.76, -95.37, 5), (33.45, -112.07, 5), (39.95, -75.17, 4),
+    (47.61, -122.33, 4), (25.76, -80.19, 4), (39.74, -104.99, 3),
+    (42.36, -71.06, 3), (30.27, -97.74, 3), (36.17, -115.14, 2),
+    (35.23, -80.84, 2), (44.98, -93.27, 2), (27.95, -82.46, 2),
+]
+
+BENCH_SCHEMA_SQL = f'''
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+SET search_path TO {SCHEMA};
+
+CREATE TABLE players (
+    id INTEGER PRIMARY KEY,
+    full_name TEXT,
+    skill_level TEXT,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    ranking_points INTEGER DEFAULT 0,
+    is_looking_for_match INTEGER DEFAULT 1,
+    account_status TEXT DEFAULT 'active',
+    last_random_challenge_at TIMESTAMP,
+    discoverability_preference TEXT,
+    current_team_id INTEGER,
+    geo_cell INTEGER
+);
+CREATE TABLE team_invitations (
+    id SERIAL PRIMARY KEY,
+    inviter_id INTEGER,
+    invitee_id INTEGER,
+    status TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE matches (
+    id SERIAL PRIMARY KEY,
+    player1_id INTEGER,
+    player2_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- same indexes the engine relies on in schema.sql
+CREATE INDEX ON players (geo_cell);
+CREATE INDEX ON players (is_looking_for_match, skill_level);
+CREATE INDEX ON team_invitations (status, inviter_id);
+CREATE INDEX ON team_invitations (status, invitee_id);
+'''
+
+PLAYER_COLUMNS = ('id', 'full_name', 'skill_level', 'latitude', 'longitude',
+                  'ranking_points', 'is_looking_for_match', 'account_status',
+                  'last_random_challenge_at', 'discoverability_preference',
+                  'current_team_id', 'geo_cell')
+
+
+class CountingConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that counts connections opened and statements executed"""
+
+    connections = 0
+    statements = 0
+    _cursor_classes = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingConnection.connections += 1
+
+    def cursor(self, *args, **kwargs):
+        base = (kwargs.pop('cursor_factory', None) or self.cursor_factory
+                or psycopg2.extensions.cursor)
+        counting = self._cursor_classes.get(base)
+        if counting is None:
+            counting = self._cursor_classes[base] = _counting_cursor(base)
+        return super().cursor(*args, cursor_factory=counting, **kwargs)
+
+    @classmethod
+    def reset(cls):
+        cls.connections = cls.statements = 0
+
+
+def _counting_cursor(base):
+    class CountingCursor(base):
+        def execute(self, query, vars=None):
+            CountingConnection.statements += 1
+            return super().execute(query, vars)
+
+    return CountingCursor
+
+
+# ---------------------------------------------------------------------------
+# Player sets
+# ---------------------------------------------------------------------------
+
+_COPY_ESCAPE = re.compile(r'\\(.)')
+_COPY_ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', '\\': '\\'}
+
+
+def read_copy_rows(path: str, table: str) -> Iterator[Dict[str, Optional[str]]]:
+    """Rows of a pg_dump COPY block (text format) for public.<table>, as dicts of strings"""
+    columns = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if columns is None:
+                if line.startswith(f'COPY public.{table} ('):
+                    columns = [c.strip() for c in
+                               line[line.index('(') + 1:line.rindex(')')].split(',')]
+                continue
+            if line.startswith('\\.'):
+                return
+            yield {
+                column: None if value == '\\N' else _COPY_ESCAPE.sub(
+                    lambda m: _COPY_ESCAPES.get(m.group(1), m.group(1)), value)
+                for column, value in zip(columns, line.rstrip('\n').split('\t'))
+            }
+
+
+def snapshot_seeds(path: str) -> List[Tuple[str, float, float]]:
+    """(skill_level, lat, lon) of every located player in a pg_dump snapshot"""
+    seeds = []
+    for row in read_copy_rows(path, 'players'):
+        lat, lon = row.get('latitude'), row.get('longitude')
+        if (lat is None or lon is None) and ',' in (row.get('location1') or ''):
+            lat, lon = row['location1'].split(',', 1)
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            continue
+        if geo_cell_for(lat, lon) is not None:
+            seeds.append((row.get('skill_level') or 'Beginner', lat, lon))
+    return seeds
+
+
+def generate_players(size: int, rng: random.Random,
+                     seeds: Optional[List[Tuple[str, float, float]]] = None) -> List[Tuple]:
+    """
+    Player rows in PLAYER_COLUMNS order.
+
+    Roughly 5% have no coordinates, 10% are not looking for a match, 10% are
+    on the 24-hour cooldown and 10% are on a locked team, so every filter of
+    the eligibility query does some work.
+    """
+    now = time.time()
+    rows = []
+    for player_id in range(1, size + 1):
+        if seeds:
+            skill, lat, lon = rng.choice(seeds)
+            lat, lon = lat + rng.gauss(0, 0.05), lon + rng.gauss(0, 0.05)
+        else:
+            metro_lat, metro_lon, _ = rng.choices(
+                METROS, weights=[m[2] for m in METROS])[0]
+            skill = rng.choices(SKILLS, weights=SKILL_WEIGHTS)[0]
+            lat, lon = metro_lat + rng.gauss(0, 0.25), metro_lon + rng.gauss(0, 0.25)
+        if rng.random() < 0.05:
+            lat = lon = None
+        recent_challenge = (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(
+            now - rng.uniform(0, 86400))) if rng.random() < 0.1 else None)
+        rows.append((
+            player_id, f'Bench Player {player_id}', skill, lat, lon,
+            rng.randint(0, 500), 0 if rng.random() < 0.1 else 1, 'active',
+            recent_challenge, rng.choice(('singles', 'doubles', 'both', None)),
+            rng.randint(1, size) if rng.random() < 0.1 else None,
+            geo_cell_for(lat, lon) if lat is not None else None,
+        ))
+    return rows
+
+
+def generate_history(rows: List[Tuple], rng: random.Random) -> Tuple[List[Tuple], List[Tuple]]:
+    """
+    Pending invitations (about 2% of players) and recent matches between
+    nearby players (about 20%), so the anti-joins and the recent-opponent
+    penalty are exercised.
+    """
+    ids = [row[0] for row in rows]
+    pending = [(rng.choice(ids), rng.choice(ids), 'pending')
+               for _ in range(len(ids) // 100)]
+    nearby = sorted((row for row in rows if row[-1] is not None),
+                    key=lambda row: (row[-1], row[0]))
+    matches = [(a[0], b[0]) for a, b in zip(nearby[::2], nearby[1::2])
+               if rng.random() < 0.2]
+    return pending, matches
+
+
+def _copy(cursor, table: str, columns: Tuple[str, ...], rows: List[Tuple]):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join('\\N' if v is None else str(v) for v in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def load_players(conn, size: int, rng: random.Random, seeds=None) -> int:
+    """Recreate the bench schema and load size players plus history"""
+    rows = generate_players(size, rng, seeds)
+    pending, matches = generate_history(rows, rng)
+    cursor = conn.cursor()
+    cursor.execute(BENCH_SCHEMA_SQL)
+    _copy(cursor, 'players', PLAYER_COLUMNS, rows)
+    _copy(cursor, 'team_invitations', ('inviter_id', 'invitee_id', 'status'), pending)
+    _copy(cursor, 'matches', ('player1_id', 'player2_id'), matches)
+    conn.commit()
+    cursor.execute('ANALYZE')
+    conn.commit()
+    return len(rows)
+
+
+# ---------------------------------------------------------------------------
+# Dry run and report
+# ---------------------------------------------------------------------------
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def singles_quality(eligible, matchups) -> Dict[str, float]:
+    gaps = [skill_gap(a['skill_level'], b['skill_level']) or 0 for a, b in matchups]
+    distances = [d for d in (haversine_miles(a['latitude'], a['longitude'],
+                                             b['latitude'], b['longitude'])
+                             for a, b in matchups) if d is not None]
+    return {
+        'pairs': len(matchups),
+        'paired_pct': 200.0 * len(matchups) / len(eligible) if eligible else 0.0,
+        'mean_gap': statistics.mean(gaps) if gaps else 0.0,
+        'mean_miles': statistics.mean(distances) if distances else 0.0,
+        'p90_miles': _percentile(distances, 0.9) if distances else 0.0,
+        'max_miles': max(distances) if distances else 0.0,
+    }
+
+
+def doubles_quality(matchups) -> Dict[str, float]:
+    """Spread = widest distance between any two of the four players"""
+    spreads = []
+    for team1, team2 in matchups:
+        players = (*team1, *team2)
+        distances = [haversine_miles(a['latitude'], a['longitude'],
+                                     b['latitude'], b['longitude'])
+                     for i, a in enumerate(players) for b in players[i + 1:]]
+        if all(d is not None for d in distances):
+            spreads.append(max(distances))
+    return {
+        'matchups': len(matchups),
+        'mean_spread': statistics.mean(spreads) if spreads else 0.0,
+        'p90_spread': _percentile(spreads, 0.9) if spreads else 0.0,
+    }
+
+
+def dry_run(engine) -> Dict[str, Dict[str, float]]:
+    """Eligibility + pairing for singles and doubles; never calls send_invitations()"""
+    report = {}
+    for match_type in ('singles', 'doubles'):
+        CountingConnection.reset()
+        started = time.perf_counter()
+        eligible = engine.get_eligible_players(match_type)
+        if match_type == 'singles':
+            quality = singles_quality(eligible, engine.create_singles_matchups(eligible))
+        else:
+            quality = doubles_quality(engine.create_doubles_matchups(eligible))
+        quality.update(eligible=len(eligible),
+                       seconds=time.perf_counter() - started,
+                       statements=CountingConnection.statements,
+                       connections=CountingConnection.connections)
+        report[match_type] = quality
+    return report
+
+
+def print_report(size: int, report: Dict[str, Dict[str, float]]):
+    s, d = report['singles'], report['doubles']
+    print(f"{size:>8} players | singles: {s['eligible']:>6} eligible, "
+          f"{s['pairs']:>6} pairs ({s['paired_pct']:5.1f}% paired), "
+          f"gap {s['mean_gap']:.2f}, miles mean {s['mean_miles']:5.1f} "
+          f"p90 {s['p90_miles']:5.1f} max {s['max_miles']:5.1f}, "
+          f"{s['statements']} statements / {s['connections']} connections, "
+          f"{s['seconds']:7.2f} s")
+    print(f"{'':>8}         | doubles: {d['eligible']:>6} eligible, "
+          f"{d['matchups']:>6} matchups, spread mean {d['mean_spread']:5.1f} "
+          f"p90 {d['p90_spread']:5.1f} miles, "
+          f"{d['statements']} statements / {d['connections']} connections, "
+          f"{d['seconds']:7.2f} s")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m services.random_matchup_engine bench',
+        description='Dry-run the Random Matchup Engine against a scratch player set')
+    parser.add_argument('--database-url', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help='local Postgres to load into (default: BENCH_DATABASE_URL)')
+    parser.add_argument('--snapshot', help='pg_dump file (e.g. backup.sql) to resample players from')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true',
+                        help=f'leave the {SCHEMA} schema in place afterwards')
+    parser.add_argument('--verbose', action='store_true', help='show engine logging')
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error('--database-url (or BENCH_DATABASE_URL) is required')
+
+    seeds = None
+    if args.snapshot:
+        seeds = snapshot_seeds(args.snapshot)
+        if not seeds:
+            parser.error(f'no located players found in {args.snapshot}')
+        print(f"Resampling {len(seeds)} snapshot players from {args.snapshot}")
+
+    # Every connection, including the engine's own, works inside the scratch schema
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['PGOPTIONS'] = f'-c search_path={SCHEMA}'
+    random_matchup_engine.connection_factory = CountingConnection
+    if not args.verbose:
+        logging.getLogger(random_matchup_engine.__name__).setLevel(logging.WARNING)
+
+    engine = random_matchup_engine.RandomMatchupEngine()
+    rng = random.Random(args.seed)
+    conn = psycopg2.connect(args.database_url)
+    try:
+        for size in args.sizes:
+            load_players(conn, size, rng, seeds)
+            random.seed(args.seed)
+            print_report(size, dry_run(engine))
+    finally:
+        if not args.keep:
+            conn.rollback()
+            conn.cursor().execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+            conn.commit()
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,18 +7,33 @@ Automatically creates random matchups between players based on:
 - Skill level compatibility (±1 level)
 - Rate limiting (1 random challenge per player per day)
 - Background processing with leader election
+
+`python -m services.random_matchup_engine bench` dry-runs the pairing
+against synthetic or snapshot players (see services/matchup_bench.py).
 """
 
 import sqlite3
 import json
+import psycopg2.extensions
+import psycopg2.extras
 import random
 import logging
 import os
 import time
 import threading
+import atexit
+import socket
+import uuid
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
 
+from services.geo_index import cells_within, geo_cell_for
+from services.pairing import pair_players, pair_players_sharded, shard_players
+
+# Benchmark mode (services/matchup_bench.py) swaps in a statement-counting connection class
+connection_factory = None
+
+
 # Database connection function - copied to avoid circular imports
 def get_db_connection():
     """Get database connection for Random Matchup Engine"""
@@ -29,115 +44,203 @@ def get_db_connection():
     if not database_url:
         raise RuntimeError("DATABASE_URL environment variable must be set")
     
-    conn = psycopg2.connect(database_url, cursor_factory=psycopg2.extras.RealDictCursor)
+    conn = psycopg2.connect(database_url, connection_factory=connection_factory,
+                            cursor_factory=psycopg2.extras.RealDictCursor)
     return conn
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# matchup_queue reasons whose players skip the 24 hour random-challenge
+# cooldown; players who declined an invitation wait it out like everyone else
+COOLDOWN_EXEMPT_REASONS = ('match_completed',)
+
+
+class EligiblePlayer:
+    """
+    Compact row for an eligible player.
+
+    Uses __slots__ to stay small when thousands are loaded per cycle.
+    Supports player['field'] access like the dict rows it replaced.
+    """
+    __slots__ = ('id', 'full_name', 'skill_level', 'latitude', 'longitude',
+                 'ranking_points')
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"EligiblePlayer(id={self.id}, skill_level={self.skill_level!r})"
+
+
 class RandomMatchupEngine:
     """Handles automatic random matchup generation between players"""
     
     def __init__(self):
-        self.lock_file = "/tmp/random_matchup.lock"
         self.job_name = "random_matchup_engine"
         self.enabled = os.environ.get("RANDOM_MATCHUP_ENABLED", "1") == "1"
+        # Leader lease in system_jobs, shared by every process on every node
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = int(os.environ.get("RANDOM_MATCHUP_LEASE_SECONDS", 300))
+        self.interval_hours = float(os.environ.get("RANDOM_MATCHUP_INTERVAL_HOURS", 6))
+        self.is_leader = False
+        self.next_run_at = None  # time.monotonic() deadline for the next full cycle
+        # Singles pairing (see services/pairing.py)
+        self.max_pair_miles = float(os.environ.get("RANDOM_MATCHUP_MAX_MILES", 25))
+        self.pair_neighbours = int(os.environ.get("RANDOM_MATCHUP_NEIGHBOURS", 12))
+        self.recent_opponent_days = int(os.environ.get("RANDOM_MATCHUP_RECENT_DAYS", 30))
+        # Region shards, paired in a process pool once there are enough players
+        self.shard_degrees = float(os.environ.get("RANDOM_MATCHUP_SHARD_DEGREES", 5))
+        self.pair_workers = int(os.environ.get("RANDOM_MATCHUP_WORKERS", os.cpu_count() or 1))
+        self.parallel_min_players = int(os.environ.get("RANDOM_MATCHUP_PARALLEL_MIN", 2000))
+        # Incremental queue (matchup_queue), drained by the leader between cycles
+        self.queue_enabled = os.environ.get("RANDOM_MATCHUP_QUEUE_ENABLED", "1") == "1"
+        self.queue_poll_seconds = int(os.environ.get("RANDOM_MATCHUP_QUEUE_POLL_SECONDS", 5))
+        self.queue_batch_size = int(os.environ.get("RANDOM_MATCHUP_QUEUE_BATCH", 200))
+        self.queue_retry_seconds = int(os.environ.get("RANDOM_MATCHUP_QUEUE_RETRY_SECONDS", 60))
+        self.queue_max_age_hours = float(os.environ.get("RANDOM_MATCHUP_QUEUE_MAX_AGE_HOURS", 24))
+        # Invitations per cycle
+        self.max_singles_per_cycle = int(os.environ.get("RANDOM_MATCHUP_MAX_SINGLES", 5))
+        self.max_doubles_per_cycle = int(os.environ.get("RANDOM_MATCHUP_MAX_DOUBLES", 3))
+        # Queue invitations per rolling window, counted in team_invitations
+        self.queue_max_singles = int(os.environ.get("RANDOM_MATCHUP_QUEUE_MAX_SINGLES",
+                                                    self.max_singles_per_cycle))
+        self.queue_window_seconds = 60 * int(os.environ.get("RANDOM_MATCHUP_QUEUE_WINDOW_MINUTES", 60))
         
     def acquire_leader_lock(self) -> bool:
-        """Acquire filesystem lock to ensure single leader"""
+        """
+        Take or renew the cluster-wide leader lease (system_jobs row).
+
+        The lease belongs to whoever last heartbeat it; anyone may take it
+        over once heartbeat_at is older than lease_seconds. Timestamps are
+        the database clock in UTC, so nodes with skewed clocks or different
+        time zones agree. Returns True while this process holds the lease.
+        """
         try:
-            # Check if lock file exists and is recent
-            if os.path.exists(self.lock_file):
-                stat = os.stat(self.lock_file)
-                if time.time() - stat.st_mtime < 3600:  # 1 hour timeout
-                    return False
-                else:
-                    os.remove(self.lock_file)  # Remove stale lock
-            
-            # Create lock file with PID
-            with open(self.lock_file, 'w') as f:
-                f.write(str(os.getpid()))
-            
-            # Update database heartbeat
-            self.update_heartbeat()
-            return True
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO system_jobs (job_name, owner_pid, heartbeat_at)
+                VALUES (%s, %s, NOW() AT TIME ZONE 'UTC')
+                ON CONFLICT (job_name) DO UPDATE
+                SET owner_pid = EXCLUDED.owner_pid, heartbeat_at = EXCLUDED.heartbeat_at
+                WHERE system_jobs.owner_pid = EXCLUDED.owner_pid
+                   OR system_jobs.heartbeat_at IS NULL
+                   OR system_jobs.heartbeat_at < (NOW() AT TIME ZONE 'UTC') - make_interval(secs => %s)
+                RETURNING EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC') - last_run_at) AS seconds_since_run
+            ''', (self.job_name, self.owner_id, self.lease_seconds))
+            row = cursor.fetchone()
+            conn.commit()
+            conn.close()
+
+            is_leader = row is not None
+            if is_leader and not self.is_leader:
+                logger.info(f"Became Random Matchup Engine leader ({self.owner_id})")
+                # Pick up the schedule where the previous leader left it; the
+                # age comes from the database so no local clock is involved
+                since_run = row['seconds_since_run']
+                wait = (max(0.0, self.interval_hours * 3600 - float(since_run))
+                        if since_run is not None else 0.0)
+                self.next_run_at = time.monotonic() + wait
+            elif self.is_leader and not is_leader:
+                logger.info("Lost Random Matchup Engine leadership")
+            self.is_leader = is_leader
+            return is_leader
             
         except Exception as e:
             logger.error(f"Failed to acquire leader lock: {e}")
+            self.is_leader = False
             return False
     
     def update_heartbeat(self):
-        """Update database heartbeat to indicate active leader"""
+        """Record a completed cycle (last_run_at) on the lease row"""
         try:
             conn = get_db_connection()
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO system_jobs (job_name, last_run_at, owner_pid, heartbeat_at)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (job_name) 
-                DO UPDATE SET last_run_at = EXCLUDED.last_run_at, owner_pid = EXCLUDED.owner_pid, heartbeat_at = EXCLUDED.heartbeat_at
-            ''', (self.job_name, datetime.now(), str(os.getpid()), datetime.now()))
+                UPDATE system_jobs
+                SET last_run_at = NOW() AT TIME ZONE 'UTC', heartbeat_at = NOW() AT TIME ZONE 'UTC'
+                WHERE job_name = %s AND owner_pid = %s
+            ''', (self.job_name, self.owner_id))
             conn.commit()
             conn.close()
         except Exception as e:
             logger.error(f"Failed to update heartbeat: {e}")
     
     def release_lock(self):
-        """Release filesystem lock"""
+        """Give up the lease so another process can take over immediately"""
         try:
-            if os.path.exists(self.lock_file):
-                os.remove(self.lock_file)
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE system_jobs SET heartbeat_at = NULL
+                WHERE job_name = %s AND owner_pid = %s
+            ''', (self.job_name, self.owner_id))
+            conn.commit()
+            conn.close()
+            self.is_leader = False
         except Exception as e:
             logger.error(f"Failed to release lock: {e}")
     
-    def get_eligible_players(self, match_type: str) -> List[Dict]:
-        """Get players eligible for random matchups"""
+    def get_eligible_players(self, match_type: str,
+                             player_ids: Optional[List[int]] = None,
+                             cells: Optional[List[int]] = None,
+                             cooldown_exempt_ids: Optional[List[int]] = None) -> List['EligiblePlayer']:
+        """
+        Get players eligible for random matchups.
+
+        One query: players with a pending invitation either way are excluded
+        by NOT EXISTS anti-joins (served by idx_team_invitations_status_inviter
+        / _invitee) instead of two COUNT(*) queries per candidate.
+        player_ids and cells (players.geo_cell, indexed) narrow the result
+        for the incremental queue worker; players in cooldown_exempt_ids skip
+        the 24 hour random-challenge cooldown.
+        """
         try:
             conn = get_db_connection()
             
             # Base eligibility criteria
-            query = '''
-                SELECT id, full_name, skill_level, discoverability_preference, 
-                       current_team_id, last_random_challenge_at, wins, losses, ranking_points
-                FROM players 
-                WHERE is_looking_for_match = 1
-                AND account_status != 'suspended'
-                AND (last_random_challenge_at IS NULL OR last_random_challenge_at < %s)
-                AND (discoverability_preference = %s OR discoverability_preference = 'both' OR discoverability_preference IS NULL)
+            query = f'''
+                SELECT {', '.join('p.' + column for column in EligiblePlayer.__slots__)}
+                FROM players p
+                WHERE p.is_looking_for_match = 1
+                AND p.account_status != 'suspended'
+                AND (p.id = ANY(%s) OR p.last_random_challenge_at IS NULL OR p.last_random_challenge_at < %s)
+                AND (p.discoverability_preference = %s OR p.discoverability_preference = 'both' OR p.discoverability_preference IS NULL)
+                AND NOT EXISTS (
+                    SELECT 1 FROM team_invitations ti
+                    WHERE ti.status = 'pending' AND ti.inviter_id = p.id
+                )
+                AND NOT EXISTS (
+                    SELECT 1 FROM team_invitations ti
+                    WHERE ti.status = 'pending' AND ti.invitee_id = p.id
+                )
             '''
             
             # 24 hours ago
             cutoff_time = datetime.now() - timedelta(hours=24)
             
-            params = [cutoff_time, match_type]
+            params = [list(cooldown_exempt_ids or []), cutoff_time, match_type]
             
             # Additional filters for doubles - no locked teams
             if match_type == 'doubles':
-                query += ' AND (current_team_id IS NULL)'
+                query += ' AND (p.current_team_id IS NULL)'
             
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            players = cursor.fetchall()
+            if player_ids is not None:
+                query += ' AND p.id = ANY(%s)'
+                params.append(list(player_ids))
+            if cells is not None:
+                query += ' AND p.geo_cell = ANY(%s)'
+                params.append(list(cells))
             
-            # Filter out players with pending invitations
-            eligible_players = []
-            for player in players:
-                # Check for pending outgoing invitations
-                cursor.execute('''
-                    SELECT COUNT(*) as count FROM team_invitations 
-                    WHERE inviter_id = %s AND status = 'pending'
-                ''', (player['id'],))
-                pending_out = cursor.fetchone()
-                
-                # Check for pending incoming invitations
-                cursor.execute('''
-                    SELECT COUNT(*) as count FROM team_invitations 
-                    WHERE invitee_id = %s AND status = 'pending'
-                ''', (player['id'],))
-                pending_in = cursor.fetchone()
-                
-                if pending_out['count'] == 0 and pending_in['count'] == 0:
-                    eligible_players.append(dict(player))
+            # Plain tuple cursor: no per-row dict
+            cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+            cursor.execute(query, params)
+            eligible_players = [EligiblePlayer(*row) for row in cursor.fetchall()]
             
             conn.close()
             logger.info(f"Found {len(eligible_players)} eligible players for {match_type} matchups")
@@ -157,156 +260,214 @@ class RandomMatchupEngine:
             skill_groups[skill].append(player)
         return skill_groups
     
+    def get_recent_opponents(self, player_ids: List[int]) -> Dict[Tuple[int, int], datetime]:
+        """Last time each pair of these players met (match or random invitation), keyed by sorted id pair"""
+        if not player_ids:
+            return {}
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT LEAST(a, b) AS low_id, GREATEST(a, b) AS high_id, MAX(met_at) AS last_met
+                FROM (
+                    SELECT player1_id AS a, player2_id AS b, created_at AS met_at
+                    FROM matches
+                    WHERE created_at > %s AND player1_id = ANY(%s) AND player2_id = ANY(%s)
+                    UNION ALL
+                    SELECT inviter_id, invitee_id, created_at
+                    FROM team_invitations
+                    WHERE created_at > %s AND inviter_id = ANY(%s) AND invitee_id = ANY(%s)
+                ) met
+                GROUP BY 1, 2
+            ''', (datetime.now() - timedelta(days=self.recent_opponent_days), player_ids, player_ids) * 2)
+            recent = {(row['low_id'], row['high_id']): row['last_met'] for row in cursor.fetchall()}
+            conn.close()
+            return recent
+        except Exception as e:
+            logger.error(f"Error loading recent opponents: {e}")
+            return {}
+
     def create_singles_matchups(self, eligible_players: List[Dict]) -> List[Tuple[Dict, Dict]]:
-        """Create random singles matchups between players of similar skill"""
-        skill_groups = self.group_by_skill_level(eligible_players)
-        matchups = []
-        
-        skill_levels = ['Beginner', 'Intermediate', 'Advanced']
-        
-        for i, skill in enumerate(skill_levels):
-            if skill not in skill_groups:
-                continue
-                
-            players_pool = skill_groups[skill].copy()
-            
-            # Add adjacent skill levels for more variety
-            if i > 0 and skill_levels[i-1] in skill_groups:
-                players_pool.extend(skill_groups[skill_levels[i-1]])
-            if i < len(skill_levels)-1 and skill_levels[i+1] in skill_groups:
-                players_pool.extend(skill_groups[skill_levels[i+1]])
-            
-            # Shuffle for randomness
-            random.shuffle(players_pool)
-            
-            # Create pairs from pool
-            while len(players_pool) >= 2:
-                player1 = players_pool.pop()
-                player2 = players_pool.pop()
-                matchups.append((player1, player2))
-        
+        """
+        Pair players of similar skill for singles via weighted matching.
+
+        Each player appears in at most one matchup; pairs are weighted by skill
+        gap, distance and how recently the two met, best pairs first. Large
+        player bases are split into region shards paired in parallel.
+        """
+        recent = self.get_recent_opponents([p['id'] for p in eligible_players])
+        if len(eligible_players) >= self.parallel_min_players:
+            matchups = pair_players_sharded(eligible_players,
+                                            max_miles=self.max_pair_miles,
+                                            neighbours=self.pair_neighbours,
+                                            recent_opponents=recent,
+                                            recent_days=self.recent_opponent_days,
+                                            shard_degrees=self.shard_degrees,
+                                            workers=self.pair_workers)
+        else:
+            matchups = pair_players(eligible_players,
+                                    max_miles=self.max_pair_miles,
+                                    neighbours=self.pair_neighbours,
+                                    recent_opponents=recent,
+                                    recent_days=self.recent_opponent_days)
+
         logger.info(f"Created {len(matchups)} singles matchups")
         return matchups
     
     def create_doubles_matchups(self, eligible_players: List[Dict]) -> List[Tuple[Tuple[Dict, Dict], Tuple[Dict, Dict]]]:
-        """Create random doubles matchups (team vs team)"""
+        """Create random doubles matchups (team vs team) within each region shard"""
         if len(eligible_players) < 4:
             return []
             
-        skill_groups = self.group_by_skill_level(eligible_players)
         matchups = []
-        
-        # Create teams first, then match teams against each other
-        teams = []
-        
-        for skill, players in skill_groups.items():
-            players_copy = players.copy()
-            random.shuffle(players_copy)
+        for shard in shard_players(eligible_players, self.shard_degrees):
+            skill_groups = self.group_by_skill_level(shard)
             
-            # Create teams from same skill level
-            while len(players_copy) >= 2:
-                team = (players_copy.pop(), players_copy.pop())
-                teams.append(team)
-        
-        # Match teams against each other
-        random.shuffle(teams)
-        while len(teams) >= 2:
-            team1 = teams.pop()
-            team2 = teams.pop()
-            matchups.append((team1, team2))
+            # Create teams first, then match teams against each other
+            teams = []
+            
+            for skill, players in skill_groups.items():
+                players_copy = players.copy()
+                random.shuffle(players_copy)
+                
+                # Create teams from same skill level
+                while len(players_copy) >= 2:
+                    team = (players_copy.pop(), players_copy.pop())
+                    teams.append(team)
+            
+            # Match teams against each other
+            random.shuffle(teams)
+            while len(teams) >= 2:
+                team1 = teams.pop()
+                team2 = teams.pop()
+                matchups.append((team1, team2))
         
+        random.shuffle(matchups)
         logger.info(f"Created {len(matchups)} doubles matchups")
         return matchups
     
-    def send_singles_invitation(self, player1: Dict, player2: Dict) -> bool:
-        """Send a singles match invitation"""
-        try:
-            conn = get_db_connection()
-            
-            # Randomly choose who sends the invitation
-            inviter = random.choice([player1, player2])
-            invitee = player2 if inviter == player1 else player1
-            
-            # Create invitation record
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO team_invitations (inviter_id, invitee_id, invitation_message, status, source, meta_json, created_at)
-                VALUES (%s, %s, %s, 'pending', 'random', %s, %s)
-            ''', (
-                inviter['id'], 
-                invitee['id'],
+    def _singles_invitation_row(self, player1, player2, now) -> Tuple:
+        """team_invitations row for a singles matchup; who invites is random"""
+        inviter = random.choice([player1, player2])
+        invitee = player2 if inviter is player1 else player1
+        return (inviter['id'], invitee['id'],
                 "Hey! Want to play a singles match?",
                 json.dumps({"type": "singles", "players": [player1['id'], player2['id']]}),
-                datetime.now()
-            ))
-            
-            # Update last random challenge time
-            cursor.execute('''
-                UPDATE players SET last_random_challenge_at = %s WHERE id IN (%s, %s)
-            ''', (datetime.now(), player1['id'], player2['id']))
-            
-            conn.commit()
-            conn.close()
-            
-            logger.info(f"Created singles invitation: {inviter['full_name']} -> {invitee['full_name']}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error sending singles invitation: {e}")
-            return False
-    
-    def send_doubles_invitation(self, team1: Tuple[Dict, Dict], team2: Tuple[Dict, Dict]) -> bool:
-        """Send a doubles match invitation"""
-        try:
-            conn = get_db_connection()
-            
-            # Choose one player from team1 to send invitation to one player from team2
-            inviter = random.choice(team1)
-            invitee = random.choice(team2)
-            
-            all_player_ids = [team1[0]['id'], team1[1]['id'], team2[0]['id'], team2[1]['id']]
-            
-            # Create invitation record
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO team_invitations (inviter_id, invitee_id, invitation_message, status, source, meta_json, created_at)
-                VALUES (%s, %s, %s, 'pending', 'random', %s, %s)
-            ''', (
-                inviter['id'], 
-                invitee['id'],
+                now)
+
+    def _doubles_invitation_row(self, team1, team2, now) -> Tuple:
+        """team_invitations row for a doubles matchup; one player from each team"""
+        inviter = random.choice(team1)
+        invitee = random.choice(team2)
+        all_player_ids = [team1[0]['id'], team1[1]['id'], team2[0]['id'], team2[1]['id']]
+        return (inviter['id'], invitee['id'],
                 "Hey! Want to play a doubles match?",
                 json.dumps({
-                    "type": "doubles", 
-                    "team1": [team1[0]['id'], team1[1]['id']], 
+                    "type": "doubles",
+                    "team1": [team1[0]['id'], team1[1]['id']],
                     "team2": [team2[0]['id'], team2[1]['id']],
                     "all_players": all_player_ids
                 }),
-                datetime.now()
-            ))
-            
-            # Update last random challenge time for all players
-            cursor.execute('''
-                UPDATE players SET last_random_challenge_at = %s WHERE id IN (%s, %s, %s, %s)
-            ''', (datetime.now(), *all_player_ids))
-            
+                now)
+
+    def write_invitations(self, cursor, singles_matchups, doubles_matchups) -> Tuple[int, int, List[int]]:
+        """
+        Insert invitations on cursor without committing.
+
+        One multi-row INSERT for every invitation and one
+        UPDATE ... WHERE id = ANY(...) for last_random_challenge_at, however
+        many matchups there are. Doubles matchups that reuse a player already
+        invited are skipped. Returns (singles_sent, doubles_sent, player_ids).
+        """
+        now = datetime.now()
+        rows, player_ids = [], set()
+
+        for player1, player2 in singles_matchups:
+            rows.append(self._singles_invitation_row(player1, player2, now))
+            player_ids.update((player1['id'], player2['id']))
+        singles_sent = len(rows)
+
+        for team1, team2 in doubles_matchups:
+            ids = {p['id'] for p in (*team1, *team2)}
+            if ids & player_ids:
+                continue
+            rows.append(self._doubles_invitation_row(team1, team2, now))
+            player_ids.update(ids)
+        doubles_sent = len(rows) - singles_sent
+
+        if not rows:
+            return 0, 0, []
+
+        psycopg2.extras.execute_values(cursor, '''
+            INSERT INTO team_invitations (inviter_id, invitee_id, invitation_message, status, source, meta_json, created_at)
+            VALUES %s
+        ''', rows, template="(%s, %s, %s, 'pending', 'random', %s, %s)", page_size=len(rows))
+
+        cursor.execute('''
+            UPDATE players SET last_random_challenge_at = %s WHERE id = ANY(%s)
+        ''', (now, list(player_ids)))
+
+        logger.info(f"Created {len(rows)} random invitations for {len(player_ids)} players")
+        return singles_sent, doubles_sent, list(player_ids)
+
+    def send_invitations(self, singles_matchups, doubles_matchups) -> Tuple[int, int]:
+        """
+        Write a cycle's invitations in one transaction.
+
+        Returns (singles_sent, doubles_sent); (0, 0) if the transaction failed.
+        """
+        if not singles_matchups and not doubles_matchups:
+            return 0, 0
+
+        conn = get_db_connection()
+        try:
+            singles_sent, doubles_sent, _ = self.write_invitations(
+                conn.cursor(), singles_matchups, doubles_matchups)
             conn.commit()
-            conn.close()
-            
-            logger.info(f"Created doubles invitation: {inviter['full_name']} -> {invitee['full_name']} (4 players total)")
-            return True
-            
+            return singles_sent, doubles_sent
+
         except Exception as e:
-            logger.error(f"Error sending doubles invitation: {e}")
-            return False
+            conn.rollback()
+            logger.error(f"Error sending random invitations: {e}")
+            return 0, 0
+        finally:
+            conn.close()
+
+    def send_singles_invitation(self, player1: Dict, player2: Dict) -> bool:
+        """Send a singles match invitation"""
+        return self.send_invitations([(player1, player2)], []) == (1, 0)
+    
+    def send_doubles_invitation(self, team1: Tuple[Dict, Dict], team2: Tuple[Dict, Dict]) -> bool:
+        """Send a doubles match invitation"""
+        return self.send_invitations([], [(team1, team2)]) == (0, 1)
+    
+    def _keep_lease_alive(self, stop: threading.Event):
+        """Renew the lease every third of lease_seconds until stop is set or the lease is lost"""
+        while not stop.wait(max(1, self.lease_seconds // 3)):
+            if not self.acquire_leader_lock():
+                logger.warning("Lost the leader lease during a matchup cycle")
+                return
     
     def run_matchup_cycle(self):
-        """Run one cycle of random matchup generation"""
+        """
+        Run one cycle of random matchup generation.
+
+        When called by the leader, a side thread keeps the lease alive for
+        however long pairing takes, and invitations are only sent if the
+        lease is still ours, so a slow cycle cannot overlap another node's.
+        """
         if not self.enabled:
             logger.info("Random Matchup Engine is disabled")
             return
             
         logger.info("Starting Random Matchup Engine cycle")
         
+        holds_lease = self.is_leader
+        stop_keeper = threading.Event()
+        if holds_lease:
+            threading.Thread(target=self._keep_lease_alive, args=(stop_keeper,),
+                             daemon=True).start()
+        
         try:
             # Get eligible players for singles and doubles
             singles_players = self.get_eligible_players('singles')
@@ -316,24 +477,185 @@ class RandomMatchupEngine:
             singles_matchups = self.create_singles_matchups(singles_players)
             doubles_matchups = self.create_doubles_matchups(doubles_players)
             
-            # Send invitations (limit to prevent spam)
-            max_singles = min(len(singles_matchups), 5)  # Max 5 singles per cycle
-            max_doubles = min(len(doubles_matchups), 3)  # Max 3 doubles per cycle
-            
-            singles_sent = 0
-            for i, (player1, player2) in enumerate(singles_matchups[:max_singles]):
-                if self.send_singles_invitation(player1, player2):
-                    singles_sent += 1
+            if holds_lease and not self.acquire_leader_lock():
+                logger.warning("Leader lease lost mid-cycle; discarding this cycle's matchups")
+                return
             
-            doubles_sent = 0
-            for i, (team1, team2) in enumerate(doubles_matchups[:max_doubles]):
-                if self.send_doubles_invitation(team1, team2):
-                    doubles_sent += 1
+            # Send invitations (capped per cycle to prevent spam), in one transaction
+            singles_sent, doubles_sent = self.send_invitations(
+                singles_matchups[:self.max_singles_per_cycle],
+                doubles_matchups[:self.max_doubles_per_cycle])
             
             logger.info(f"Random Matchup Engine cycle complete: {singles_sent} singles, {doubles_sent} doubles invitations sent")
             
         except Exception as e:
             logger.error(f"Error in matchup cycle: {e}")
+        finally:
+            stop_keeper.set()
+    
+    def lock_queued_players(self, cursor) -> Dict[int, str]:
+        """
+        Lock up to queue_batch_size matchup_queue rows on cursor's transaction.
+
+        Players never tried come first, then the least recently tried;
+        players tried within queue_retry_seconds are left alone. Returns
+        {player_id: reason}.
+        """
+        cursor.execute('''
+            SELECT player_id, reason FROM matchup_queue
+            WHERE attempted_at IS NULL
+               OR attempted_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+            ORDER BY attempted_at NULLS FIRST, enqueued_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ''', (self.queue_retry_seconds, self.queue_batch_size))
+        return {row['player_id']: row['reason'] for row in cursor.fetchall()}
+    
+    def settle_queued_players(self, cursor, locked_ids: List[int], invited_ids: List[int]):
+        """
+        Update matchup_queue after a pass, on the same transaction as the invitations.
+
+        Invited players leave the queue; locked players who were not invited
+        stay, marked attempted, until they are older than queue_max_age_hours
+        (the full cycle covers them from then on).
+        """
+        cursor.execute('''
+            DELETE FROM matchup_queue WHERE player_id = ANY(%s)
+        ''', (list(invited_ids),))
+        cursor.execute('''
+            DELETE FROM matchup_queue
+            WHERE player_id = ANY(%s)
+            AND enqueued_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+        ''', (list(locked_ids), int(self.queue_max_age_hours * 3600)))
+        cursor.execute('''
+            UPDATE matchup_queue SET attempted_at = CURRENT_TIMESTAMP
+            WHERE player_id = ANY(%s)
+        ''', (list(locked_ids),))
+    
+    def queue_budget(self, cursor) -> int:
+        """
+        Random invitations still allowed in the current window.
+
+        Counted from team_invitations, so the cap holds across leader changes
+        and restarts. created_at is written with the engine's datetime.now(),
+        so the window is measured on the same clock.
+        """
+        cursor.execute('''
+            SELECT COUNT(*) AS sent FROM team_invitations
+            WHERE source = 'random' AND created_at >= %s
+        ''', (datetime.now() - timedelta(seconds=self.queue_window_seconds),))
+        return max(0, self.queue_max_singles - cursor.fetchone()['sent'])
+    
+    def process_matchup_queue(self) -> int:
+        """
+        Pair newly available players against the live pool around them.
+
+        Queued players who are eligible and located are paired (singles) with
+        eligible players in the geo cells within max_pair_miles; every pair
+        includes at least one queued player. Returns the number of
+        invitations sent.
+
+        The queue rows stay locked (FOR UPDATE SKIP LOCKED) while pairing, and
+        the invitations and the queue update commit together: if sending fails
+        nothing leaves the queue. Players without a partner, or not eligible
+        yet (a pending invitation, the cooldown), are retried every
+        queue_retry_seconds until they age out.
+
+        Like the full cycle's max_singles_per_cycle, invitations are capped:
+        at most queue_max_singles random invitations per queue_window_seconds,
+        including the full cycle's. Once the budget is spent the queue is left
+        alone.
+        """
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            budget = self.queue_budget(cursor)
+            if budget <= 0:
+                return 0
+            
+            entries = self.lock_queued_players(cursor)
+            if not entries:
+                return 0
+            
+            exempt_ids = [pid for pid, reason in entries.items()
+                          if reason in COOLDOWN_EXEMPT_REASONS]
+            queued = [p for p in self.get_eligible_players('singles', player_ids=list(entries),
+                                                           cooldown_exempt_ids=exempt_ids)
+                      if geo_cell_for(p.latitude, p.longitude) is not None]
+            
+            matchups, pool = [], []
+            if queued:
+                cells = set()
+                for p in queued:
+                    cells.update(cells_within(p.latitude, p.longitude, self.max_pair_miles))
+                queued_ids = {p.id for p in queued}
+                pool = queued + [p for p in self.get_eligible_players('singles', cells=sorted(cells))
+                                 if p.id not in queued_ids]
+                
+                recent = self.get_recent_opponents([p.id for p in pool])
+                matchups = pair_players(pool,
+                                        max_miles=self.max_pair_miles,
+                                        neighbours=self.pair_neighbours,
+                                        recent_opponents=recent,
+                                        recent_days=self.recent_opponent_days,
+                                        required_ids=queued_ids)[:budget]
+            
+            singles_sent, _, invited_ids = self.write_invitations(cursor, matchups, [])
+            self.settle_queued_players(cursor, list(entries), invited_ids)
+            conn.commit()
+            
+            logger.info(f"Matchup queue: {len(entries)} queued, {len(queued)} eligible, "
+                        f"{singles_sent} invitations from a pool of {len(pool)}")
+            return singles_sent
+        
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error processing matchup queue: {e}")
+            return 0
+        finally:
+            conn.close()
+    
+    def run_scheduler(self):
+        """
+        Scheduler loop: elect a leader and, while leading, run full cycles and drain the queue.
+
+        Blocks forever; start_background_scheduler() runs it in a daemon thread.
+        """
+        logger.info("Random Matchup Engine scheduler started")
+        heartbeat_every = max(1, self.lease_seconds // 3)
+        renewed_at = 0.0
+
+        while True:
+            try:
+                if not self.is_leader or time.monotonic() - renewed_at >= heartbeat_every:
+                    if not self.acquire_leader_lock():
+                        # Follower: one cheap UPDATE per lease period
+                        time.sleep(self.lease_seconds + random.randint(0, heartbeat_every))
+                        continue
+                    renewed_at = time.monotonic()
+
+                if time.monotonic() >= self.next_run_at:
+                    # Full cycle: reconciles anything the queue worker skipped
+                    logger.info("Leader running matchup cycle")
+                    self.run_matchup_cycle()
+                    self.update_heartbeat()
+                    renewed_at = time.monotonic()
+
+                    # Next cycle in interval_hours to 2x interval_hours (jitter)
+                    delay = self.interval_hours * 3600 * (1 + random.random())
+                    self.next_run_at = time.monotonic() + delay
+                    logger.info(f"Next matchup cycle in {delay/3600:.1f} hours")
+
+                if self.queue_enabled:
+                    self.process_matchup_queue()
+                    time.sleep(self.queue_poll_seconds)
+                else:
+                    # Leader: keep the lease alive until the next cycle is due
+                    time.sleep(heartbeat_every)
+
+            except Exception as e:
+                logger.error(f"Error in scheduler loop: {e}")
+                time.sleep(heartbeat_every)
     
     def start_background_scheduler(self):
         """Start the background scheduler thread"""
@@ -341,50 +663,65 @@ class RandomMatchupEngine:
             logger.info("Random Matchup Engine is disabled via RANDOM_MATCHUP_ENABLED=0")
             return
             
-        def scheduler_loop():
-            logger.info("Random Matchup Engine background scheduler started")
-            
-            while True:
-                try:
-                    if self.acquire_leader_lock():
-                        logger.info("Acquired leader lock, running matchup cycle")
-                        self.run_matchup_cycle()
-                        self.update_heartbeat()
-                    else:
-                        logger.debug("Failed to acquire leader lock, skipping cycle")
-                    
-                    # Sleep for 6-12 hours with jitter
-                    base_sleep = 6 * 3600  # 6 hours
-                    jitter = random.randint(0, 6 * 3600)  # 0-6 hours
-                    total_sleep = base_sleep + jitter
-                    
-                    logger.info(f"Sleeping for {total_sleep/3600:.1f} hours until next cycle")
-                    time.sleep(total_sleep)
-                    
-                except Exception as e:
-                    logger.error(f"Error in scheduler loop: {e}")
-                    time.sleep(3600)  # Sleep 1 hour on error
-                finally:
-                    self.release_lock()
-        
         # Start scheduler thread
-        scheduler_thread = threading.Thread(target=scheduler_loop, daemon=True)
+        scheduler_thread = threading.Thread(target=self.run_scheduler, daemon=True)
         scheduler_thread.start()
+        atexit.register(self.release_lock)
         logger.info("Background scheduler thread started")
 
 
+_engine = None
+_engine_lock = threading.Lock()
+
+
 def start_random_matchup_engine():
-    """Start the Random Matchup Engine background service"""
-    engine = RandomMatchupEngine()
-    engine.start_background_scheduler()
-    return engine
+    """
+    Create the process's Random Matchup Engine (once per process).
+
+    The scheduler thread only starts with RANDOM_MATCHUP_SCHEDULER=1. It is
+    off by default so web workers stay out of the election; run the engine
+    in one designated process instead (flask --app main run-jobs, or
+    python -m services.random_matchup_engine scheduler). If it is turned on
+    in several processes, the system_jobs lease is the only guard: every
+    process keeps a scheduler thread, and only the lease holder runs cycles.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RandomMatchupEngine()
+            if os.environ.get("RANDOM_MATCHUP_SCHEDULER", "0") == "1":
+                _engine.start_background_scheduler()
+            else:
+                logger.info("Random Matchup Engine scheduler not started in this process "
+                            "(RANDOM_MATCHUP_SCHEDULER=1 or run-jobs to run it)")
+        return _engine
+
+
+def run_random_matchup_scheduler():
+    """Run the scheduler in the foreground of a designated jobs process; never returns"""
+    engine = start_random_matchup_engine()
+    if not engine.enabled:
+        logger.info("Random Matchup Engine is disabled via RANDOM_MATCHUP_ENABLED=0")
+        return
+    atexit.register(engine.release_lock)
+    engine.run_scheduler()
 
 
 if __name__ == "__main__":
+    # Dry-run benchmark: python -m services.random_matchup_engine bench --help
+    import sys
+    if sys.argv[1:2] == ['bench']:
+        from services.matchup_bench import main
+        sys.exit(main(sys.argv[2:]))
+    # Designated scheduler process: python -m services.random_matchup_engine scheduler
+    if sys.argv[1:2] == ['scheduler']:
+        run_random_matchup_scheduler()
+        sys.exit(0)
+    
     # For testing - run one cycle
     engine = RandomMatchupEngine()
     if engine.acquire_leader_lock():
         engine.run_matchup_cycle()
         engine.release_lock()
     else:
-        print("Failed to acquire lock - another instance may be running")
\ No newline at end of file
+        print("Another process holds the leader lease - not running a cycle")
\ No newline at end of file
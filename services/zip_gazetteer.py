@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Offline US ZIP code gazetteer
+
+ZIP centroids live in a bundled binary file that is memory-mapped once per
+process. The file is a flat array indexed by the 5-digit ZIP itself, so a
+lookup is one offset calculation and no network call:
+
+    header  8 bytes   b'R2DZIP\\x01\\x00'
+    body    100000 x (int32 lat, int32 lon), little-endian, degrees * 1e4
+            (MISSING in both fields for ZIPs that don't exist)
+
+The bundled data/us_zip_centroids.bin was generated from the MIT-licensed
+`zipcodes` package dataset. To rebuild it from any CSV with zip, lat and
+lon columns:
+
+    python services/zip_gazetteer.py zips.csv services/data/us_zip_centroids.bin
+"""
+
+import csv
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'R2DZIP\x01\x00'
+RECORD = struct.Struct('<ii')
+SCALE = 10000
+MISSING = -2**31
+ZIP_COUNT = 100000
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'data', 'us_zip_centroids.bin')
+
+
+class ZipGazetteer:
+    """Memory-mapped ZIP -> (lat, lon) table, opened lazily on first lookup"""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._map = None
+        self._lock = threading.Lock()
+        self._unavailable = False
+
+    def _open(self):
+        with self._lock:
+            if self._map is not None or self._unavailable:
+                return
+            try:
+                with open(self.path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if (mapped[:len(MAGIC)] != MAGIC or len(mapped) !=
+                        len(MAGIC) + ZIP_COUNT * RECORD.size):
+                    raise ValueError('unexpected file format')
+                self._map = mapped
+            except (OSError, ValueError) as e:
+                logger.error(f"ZIP gazetteer unavailable ({self.path}): {e}")
+                self._unavailable = True
+
+    def lookup(self, zip_code) -> Tuple[Optional[float], Optional[float]]:
+        """Return (lat, lon) for a 5-digit ZIP, or (None, None) if unknown"""
+        zip_code = str(zip_code or '').strip()[:5]
+        if len(zip_code) != 5 or not zip_code.isdigit():
+            return None, None
+        if self._map is None:
+            self._open()
+            if self._map is None:
+                return None, None
+        lat, lon = RECORD.unpack_from(self._map,
+                                      len(MAGIC) + int(zip_code) * RECORD.size)
+        if lat == MISSING:
+            return None, None
+        return lat / SCALE, lon / SCALE
+
+
+def build(rows: Iterable[Tuple[str, float, float]], path: str) -> int:
+    """Write a gazetteer file from (zip, lat, lon) rows; returns the number of ZIPs stored"""
+    body = bytearray(RECORD.pack(MISSING, MISSING) * ZIP_COUNT)
+    stored = 0
+    for zip_code, lat, lon in rows:
+        zip_code = str(zip_code).strip().zfill(5)
+        if len(zip_code) != 5 or not zip_code.isdigit():
+            continue
+        RECORD.pack_into(body,
+                         int(zip_code) * RECORD.size, round(float(lat) * SCALE),
+                         round(float(lon) * SCALE))
+        stored += 1
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(body)
+    return stored
+
+
+_default_gazetteer = ZipGazetteer()
+
+
+def lookup_zip(zip_code) -> Tuple[Optional[float], Optional[float]]:
+    """Look up a ZIP in the bundled gazetteer"""
+    return _default_gazetteer.lookup(zip_code)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: zip_gazetteer.py <zips.csv with zip,lat,lon> <output.bin>")
+        sys.exit(1)
+    with open(sys.argv[1], newline='') as f:
+        reader = csv.DictReader(f)
+        count = build(((r['zip'], r['lat'], r['lon']) for r in reader),
+                      sys.argv[2])
+    print(f"Wrote {count} ZIP centroids to {sys.argv[2]}")
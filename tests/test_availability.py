@@ -0,0 +1,86 @@
+import pytest
+
+from services.availability import (
+    DAYS, SLOT_MINUTES, SLOTS_PER_DAY, WEEK_BITS, bits_to_mask, describe_slot,
+    first_slot, mask_to_bits, overlap_slots, parse_time_slot, schedule_to_mask)
+
+
+def slot(day, hour):
+    return DAYS.index(day) * SLOTS_PER_DAY + hour * 60 // SLOT_MINUTES
+
+
+@pytest.mark.parametrize('label, span', [
+    ('6 PM', (18 * 60, 19 * 60)),
+    ('6pm', (18 * 60, 19 * 60)),
+    ('6:30 p.m.', (18 * 60 + 30, 19 * 60 + 30)),
+    ('12 AM', (0, 60)),
+    ('18:00', (18 * 60, 19 * 60)),
+    ('6:00 PM - 8:00 PM', (18 * 60, 20 * 60)),
+    ('18:00-20:00', (18 * 60, 20 * 60)),
+    ('9 am to 11 am', (9 * 60, 11 * 60)),
+    ('10 PM - 2 AM', (22 * 60, 24 * 60)),
+    ('Evening', (17 * 60, 21 * 60)),
+    ('morning (6-12)', (6 * 60, 12 * 60)),
+])
+def test_parse_time_slot(label, span):
+    assert parse_time_slot(label) == span
+
+
+@pytest.mark.parametrize('label', ['', None, 'xyz', '2 m', '6 pmx', '13 PM', '25:00', '6:75',
+                                   '6 PM - later'])
+def test_parse_time_slot_rejects_unreadable_labels(label):
+    assert parse_time_slot(label) is None
+
+
+def test_schedule_to_mask_sets_slots_of_available_days():
+    mask = schedule_to_mask({
+        'monday': {'available': True, 'time_slots': ['6:00 PM - 8:00 PM']},
+        'tuesday': {'available': False, 'time_slots': ['6:00 PM - 8:00 PM']},
+    })
+    expected = 0
+    for index in range(slot('monday', 18), slot('monday', 20)):
+        expected |= 1 << index
+    assert mask == expected
+
+
+def test_available_day_without_readable_slots_is_free_all_day():
+    mask = schedule_to_mask({'sunday': {'available': True, 'time_slots': ['whenever']}})
+    assert mask == ((1 << SLOTS_PER_DAY) - 1) << slot('sunday', 0)
+
+
+def test_empty_schedule_gives_empty_mask():
+    assert schedule_to_mask(None) == 0
+    assert schedule_to_mask({}) == 0
+    assert first_slot(0) is None
+
+
+@pytest.mark.parametrize('mask', [0, 1, 1 << (WEEK_BITS - 1), (1 << WEEK_BITS) - 1,
+                                  0b1011 << slot('wednesday', 7)])
+def test_bits_round_trip(mask):
+    bits = mask_to_bits(mask)
+    assert len(bits) == WEEK_BITS
+    assert bits_to_mask(bits) == mask
+
+
+def test_bits_character_i_is_slot_i():
+    assert mask_to_bits(1 << 3)[3] == '1'
+    assert mask_to_bits(1 << 3).count('1') == 1
+
+
+def test_bits_from_another_slot_size_are_ignored():
+    assert bits_to_mask(None) is None
+    assert bits_to_mask('1' * (WEEK_BITS + 1)) is None
+
+
+def test_overlap_slots_counts_common_free_time():
+    evenings = schedule_to_mask({'monday': {'available': True, 'time_slots': ['5 PM - 9 PM']}})
+    late = schedule_to_mask({'monday': {'available': True, 'time_slots': ['7 PM - 11 PM']}})
+    assert overlap_slots(evenings, late) == 2 * 60 // SLOT_MINUTES
+    assert describe_slot(slot('monday', 19)) == 'Monday 7:00 PM'
+    assert first_slot(evenings & late) == 'Monday 7:00 PM'
+
+
+def test_describe_slot_format():
+    assert describe_slot(slot('monday', 0)) == 'Monday 12:00 AM'
+    assert describe_slot(slot('friday', 12)) == 'Friday 12:00 PM'
+    assert describe_slot(WEEK_BITS - 1).startswith('Sunday 11:')
@@ -0,0 +1,151 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from services.distance import haversine_miles
+from services.pairing import (_greedy_matching, max_weight_pairs, pair_players,
+                              pair_players_sharded, skill_gap)
+
+SKILLS = ('Beginner', 'Intermediate', 'Advanced')
+METROS = [(40.71, -74.01), (34.05, -118.24), (41.88, -87.63)]
+
+
+def make_players(count, seed=1, unlocated=0.0):
+    rng = random.Random(seed)
+    players = []
+    for player_id in range(1, count + 1):
+        lat, lon = rng.choice(METROS)
+        lat, lon = lat + rng.gauss(0, 0.2), lon + rng.gauss(0, 0.2)
+        if rng.random() < unlocated:
+            lat = lon = None
+        players.append({'id': player_id, 'skill_level': rng.choice(SKILLS),
+                        'latitude': lat, 'longitude': lon})
+    return players
+
+
+def ids_of(pairs):
+    return [p['id'] for pair in pairs for p in pair]
+
+
+@pytest.fixture(autouse=True)
+def fixed_jitter():
+    random.seed(0)
+
+
+def test_no_player_appears_twice():
+    pairs = pair_players(make_players(500, unlocated=0.1))
+    ids = ids_of(pairs)
+    assert pairs
+    assert len(ids) == len(set(ids))
+
+
+def test_pairs_respect_max_miles_and_skill_gap():
+    for a, b in pair_players(make_players(500), max_miles=10):
+        assert haversine_miles(a['latitude'], a['longitude'],
+                               b['latitude'], b['longitude']) <= 10
+        assert skill_gap(a['skill_level'], b['skill_level']) is not None
+
+
+def test_unlocated_players_only_pair_with_each_other():
+    for a, b in pair_players(make_players(300, unlocated=0.3)):
+        assert (a['latitude'] is None) == (b['latitude'] is None)
+
+
+def test_required_ids_are_in_every_pair():
+    players = make_players(300)
+    required = {p['id'] for p in players[:20]}
+    pairs = pair_players(players, required_ids=required)
+    assert pairs
+    for a, b in pairs:
+        assert a['id'] in required or b['id'] in required
+
+
+def test_far_apart_players_are_not_paired():
+    players = [
+        {'id': 1, 'skill_level': 'Beginner', 'latitude': 40.7, 'longitude': -74.0},
+        {'id': 2, 'skill_level': 'Beginner', 'latitude': 34.0, 'longitude': -118.2},
+    ]
+    assert pair_players(players, max_miles=25) == []
+
+
+def test_skills_two_levels_apart_are_not_paired():
+    players = [
+        {'id': 1, 'skill_level': 'Beginner', 'latitude': 40.7, 'longitude': -74.0},
+        {'id': 2, 'skill_level': 'Advanced', 'latitude': 40.7, 'longitude': -74.0},
+    ]
+    assert pair_players(players) == []
+
+
+def test_recent_opponents_are_avoided():
+    players = [
+        {'id': i, 'skill_level': 'Beginner', 'latitude': 40.7, 'longitude': -74.0}
+        for i in (1, 2, 3, 4)
+    ]
+    recent = {(1, 2): datetime.now(), (3, 4): datetime.now()}
+    pairs = {tuple(sorted(ids)) for ids in
+             ([a['id'], b['id']] for a, b in pair_players(players, recent_opponents=recent))}
+    assert (1, 2) not in pairs and (3, 4) not in pairs
+    assert len(pairs) == 2
+
+
+def test_sharded_pairing_matches_serial_constraints():
+    players = make_players(800, unlocated=0.05)
+    pairs = pair_players_sharded(players, shard_degrees=1.0, workers=1)
+    ids = ids_of(pairs)
+    assert pairs
+    assert len(ids) == len(set(ids))
+    for a, b in pairs:
+        if a['latitude'] is not None:
+            assert haversine_miles(a['latitude'], a['longitude'],
+                                   b['latitude'], b['longitude']) <= 25
+
+
+def brute_force_best(edges):
+    """Weight of the best matching, by trying every subset of disjoint edges"""
+    edge_list = sorted(edges.items())
+
+    def best(k, used):
+        if k == len(edge_list):
+            return 0.0
+        (i, j), w = edge_list[k]
+        skip = best(k + 1, used)
+        if i in used or j in used:
+            return skip
+        return max(skip, w + best(k + 1, used | {i, j}))
+
+    return best(0, frozenset())
+
+
+def random_edges(seed, nodes=9, density=0.45):
+    rng = random.Random(seed)
+    return {(i, j): rng.uniform(1, 100)
+            for i in range(nodes) for j in range(i + 1, nodes)
+            if rng.random() < density}
+
+
+def check_matching(pairs, edges):
+    nodes = [i for pair in pairs for i in pair]
+    assert len(nodes) == len(set(nodes))
+    assert all(pair in edges for pair in pairs)
+    return sum(edges[pair] for pair in pairs)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_small_components_get_the_optimal_matching(seed):
+    pytest.importorskip('networkx')
+    edges = random_edges(seed)
+    weight = check_matching(max_weight_pairs(edges), edges)
+    assert weight == pytest.approx(brute_force_best(edges))
+
+
+def test_greedy_approximation_stays_close_to_optimal():
+    ratios = []
+    for seed in range(100):
+        edges = random_edges(seed)
+        if edges:
+            ratios.append(check_matching(_greedy_matching(edges), edges) /
+                          brute_force_best(edges))
+    # Heaviest-edge-first is a 1/2-approximation; the swaps only add weight
+    assert min(ratios) >= 0.5
+    assert sum(ratios) / len(ratios) >= 0.93